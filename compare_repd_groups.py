@@ -8,22 +8,31 @@ Compare REPD groupings from SS dataset with Turing REPD groupings
 import sys
 import os
 import argparse
-import time
 
 import pandas as pd
 import numpy as np
 
 from ss_repd_pairings import main as ss_repd_pairings
+from telemetry import Telemetry
 
-def main(ss_file, turing_file, out_file):
+def main(ss_file, turing_file, out_file, telemetry_file=None):
     """
     Concatenate Turing REPD groupings and SS REPD groupings then compare against one another.
     Resulting dataframe is saved to a csv file.
     """
-    ss_groupings = ss_repd_pairings(ss_file)
-    turing_groupings = unstack_turing_groupings(turing_file)
-    compared_dataframe = compare_to_ss_dataset(ss_groupings, turing_groupings)
-    compared_dataframe.to_csv(out_file, index=False)
+    telemetry = Telemetry("compare_repd_groups", telemetry_file)
+    with telemetry.stage("read", total=2) as stage:
+        ss_groupings = ss_repd_pairings(ss_file)
+        stage.update()
+        turing_groupings = unstack_turing_groupings(turing_file)
+        stage.update()
+    with telemetry.stage("compare", total=len(ss_groupings.index)) as stage:
+        compared_dataframe = compare_to_ss_dataset(ss_groupings, turing_groupings,
+                                                   progress=stage.update)
+    with telemetry.stage("write", total=len(compared_dataframe.index)) as stage:
+        compared_dataframe.to_csv(out_file, index=False)
+        stage.update(len(compared_dataframe.index))
+    telemetry.finish()
 
 def unstack_turing_groupings(filename):
     """
@@ -47,39 +56,10 @@ def unstack_turing_groupings(filename):
     grouped_repd_ids = grouped_repd_ids.add_prefix("turing_")
     return grouped_repd_ids
 
-def print_progress(iteration, total, prefix="", suffix="", decimals=2, bar_length=100):
-    """
-    Call in a loop to create terminal progress bar.
-    Parameters
-    ----------
-    `iteration` : int
-        current iteration (required)
-    `total` : int
-        total iterations (required)
-    `prefix` : string
-        prefix string (optional)
-    `suffix` : string
-        suffix string (optional)
-    `decimals` : int
-        number of decimals in percent complete (optional)
-    `bar_length` : int
-        character length of bar (optional)
-    Notes
-    -----
-    Taken from `Stack Overflow <http://stackoverflow.com/a/34325723>`_.
-    """
-    filled_length = int(round(bar_length * iteration / float(total)))
-    percents = round(100.00 * (iteration / float(total)), decimals)
-    progress_bar = "#" * filled_length + "-" * (bar_length - filled_length)
-    sys.stdout.write("\r%s |%s| %s%s %s" % (prefix, progress_bar, percents, "%", suffix))
-    sys.stdout.flush()
-    if iteration == total:
-        sys.stdout.write("\n")
-        sys.stdout.flush()
-
-def compare_to_ss_dataset(ss_groupings, turing_groupings):
+def compare_to_ss_dataset(ss_groupings, turing_groupings, progress=None):
     """
     Compares the Turing groupings to the SS groupings and assigns a flag to each group as to whether they are correct or not.
+    If given, `progress` is called with no arguments after each SS group is compared.
     """
     ss_groupings = ss_groupings.add_prefix("ss_")
     turing_groupings.reset_index(inplace=True)
@@ -87,15 +67,12 @@ def compare_to_ss_dataset(ss_groupings, turing_groupings):
     turing_groupings.rename(columns={'':'group_id'}, inplace=True)
     ss_groupings.columns = ss_groupings.columns.get_level_values(1)
     matches = []
-    count = 0
-    start_time = time.time()
     for i, ss_row in ss_groupings.filter(like="ss_").iterrows():
         for j, t_row in turing_groupings.filter(like="turing_").iterrows():
             if any([ssc in t_row.values for ssc in ss_row.values]):
                 matches.append([i] + ss_groupings.loc[i].to_list() + turing_groupings.loc[j].to_list())
-        count += 1
-        print_progress(count, len(ss_groupings.index))
-    print("--- Execution time: %s seconds ---" % round((time.time() - start_time), 2))
+        if progress is not None:
+            progress()
     compare_groupings = pd.DataFrame(matches, columns=["ssid"] + ss_groupings.columns.to_list() + turing_groupings.columns.to_list())
     compare_groupings = compare_groupings.assign(failed_grouping=pd.NA)
     for i, row in compare_groupings.iterrows():
@@ -167,6 +144,9 @@ def parse_options():
     parser.add_argument("-o", "--out-file", dest="out_file", action="store", type=str,
                         required=True, metavar="</path/to/file>",
                         help="Specify the path to the output file.")
+    parser.add_argument("--telemetry-file", dest="telemetry_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Optionally specify a file to append JSON-lines progress events to.")
     options = parser.parse_args()
     if not os.path.isfile(options.ss_file):
         raise Exception(f"The ss file '{options.ss_file}' does not exist.")
@@ -179,4 +159,4 @@ def parse_options():
     return options
 if __name__ == "__main__":
     OPTIONS = parse_options()
-    main(OPTIONS.ss_file, OPTIONS.turing_file, OPTIONS.out_file)
+    main(OPTIONS.ss_file, OPTIONS.turing_file, OPTIONS.out_file, OPTIONS.telemetry_file)
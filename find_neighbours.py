@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Find neighbouring OSM ways from their geometry, producing object/neighbour_object pairings.
+
+Way bounding boxes (expanded by the buffer distance) are bucketed into a uniform grid, candidate
+pairs are taken from ways sharing a grid cell and then each candidate pair is checked exactly:
+two ways are neighbours if their polygons overlap or come within the buffer distance.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS = 6371008.8 # mean Earth radius in metres
+METRES_PER_DEGREE = EARTH_RADIUS * np.pi / 180
+
+def load_way_geometry(filename):
+    """
+    Load way geometry from a CSV with columns objects, lats and lons (pipe-separated), e.g. the
+    output of fix_groupings.py.
+
+    Returns
+    -------
+    tuple
+        (objects, lats, lons, offsets) where the nodes of way `i` are
+        `lats[offsets[i]:offsets[i+1]]`. Duplicate objects are dropped.
+    """
+    ways = pd.read_csv(filename, usecols=["objects", "lats", "lons"])
+    ways = ways.drop_duplicates("objects").dropna().reset_index(drop=True)
+    lats = ways.lats.str.split("|")
+    lengths = lats.str.len().to_numpy()
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    lats = np.array(lats.explode().to_numpy(), dtype=np.float64)
+    lons = np.array(ways.lons.str.split("|").explode().to_numpy(), dtype=np.float64)
+    if len(lons) != len(lats):
+        raise ValueError(f"The lats and lons in '{filename}' have different lengths")
+    return ways.objects.to_numpy(), lats, lons, offsets
+
+def _expand(counts):
+    """For ragged blocks of the given sizes, return (block index, index within block) arrays."""
+    block = np.repeat(np.arange(len(counts)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return block, within
+
+def _chunks(costs, budget):
+    """
+    Split items into consecutive slices whose total cost is at most `budget` (an item costing
+    more than `budget` gets a slice to itself).
+    """
+    ends = np.cumsum(costs)
+    start = 0
+    while start < len(ends):
+        spent = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, spent + budget, side="right")), start + 1)
+        yield slice(start, stop)
+        start = stop
+
+def _bounding_boxes(lats, lons, offsets, buffer_m):
+    """Return the (min_lat, max_lat, min_lon, max_lon) of each way, expanded by `buffer_m`."""
+    starts = offsets[:-1]
+    min_lat = np.minimum.reduceat(lats, starts)
+    max_lat = np.maximum.reduceat(lats, starts)
+    min_lon = np.minimum.reduceat(lons, starts)
+    max_lon = np.maximum.reduceat(lons, starts)
+    pad_lat = buffer_m / METRES_PER_DEGREE
+    pad_lon = pad_lat / np.cos(np.radians(np.maximum(np.abs(min_lat), np.abs(max_lat))))
+    return min_lat - pad_lat, max_lat + pad_lat, min_lon - pad_lon, max_lon + pad_lon
+
+def candidate_pairs(lats, lons, offsets, buffer_m, cell_m=100., max_elements=1000000):
+    """
+    Find pairs of ways whose bounding boxes, expanded by `buffer_m` metres, overlap. Pairs of
+    ways sharing a grid cell are generated at most `max_elements` at a time.
+
+    Returns
+    -------
+    tuple of NumPy arrays
+        (a, b) way indices with a < b.
+    """
+    n_ways = len(offsets) - 1
+    min_lat, max_lat, min_lon, max_lon = _bounding_boxes(lats, lons, offsets, buffer_m)
+    cell_lat = max(cell_m, 2 * buffer_m) / METRES_PER_DEGREE
+    cell_lon = cell_lat / np.cos(np.radians(np.abs(lats).max()))
+    # Insert every way into every grid cell its expanded bounding box touches
+    row0 = np.floor(min_lat / cell_lat).astype(np.int64)
+    row1 = np.floor(max_lat / cell_lat).astype(np.int64)
+    col0 = np.floor(min_lon / cell_lon).astype(np.int64)
+    col1 = np.floor(max_lon / cell_lon).astype(np.int64)
+    n_rows, n_cols = row1 - row0 + 1, col1 - col0 + 1
+    way, k = _expand(n_rows * n_cols)
+    rows = row0[way] + k // n_cols[way]
+    cols = col0[way] + k % n_cols[way]
+    cell = rows * (2 ** 32) + (cols - cols.min())
+    order = np.lexsort((way, cell))
+    cell, way = cell[order], way[order]
+    # All pairs within each cell, pairing each entry with the entries after it in its cell
+    cell_start = np.flatnonzero(np.concatenate(([True], cell[1:] != cell[:-1])))
+    cell_count = np.diff(np.concatenate((cell_start, [len(cell)])))
+    position = np.arange(len(cell))
+    n_after = np.repeat(cell_start + cell_count, cell_count) - position - 1
+    pairs = []
+    for chunk in _chunks(n_after, max_elements):
+        left, k = _expand(n_after[chunk])
+        left += chunk.start
+        a, b = way[left], way[left + 1 + k]
+        overlap = (min_lat[a] <= max_lat[b]) & (min_lat[b] <= max_lat[a]) & \
+                  (min_lon[a] <= max_lon[b]) & (min_lon[b] <= max_lon[a])
+        a, b = a[overlap], b[overlap]
+        pairs.append(np.unique(np.minimum(a, b) * n_ways + np.maximum(a, b)))
+    pairs = np.unique(np.concatenate(pairs)) if pairs else np.array([], dtype=np.int64)
+    return pairs // n_ways, pairs % n_ways
+
+def _edges(offsets, ways):
+    """
+    List the edges of each of `ways` (a single node is a zero-length edge).
+
+    Returns
+    -------
+    tuple of NumPy arrays
+        (pair, p0, p1) where edge `i` joins nodes `p0[i]` and `p1[i]` of `ways[pair[i]]`.
+    """
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    pair, k = _expand(np.maximum(lengths[ways] - 1, 1))
+    p0 = starts[ways][pair] + k
+    p1 = starts[ways][pair] + np.minimum(k + 1, lengths[ways][pair] - 1)
+    return pair, p0, p1
+
+def _edge_in_box(lats, lons, p0, p1, boxes, ways):
+    """Whether each edge overlaps the buffered bounding box of the corresponding way in `ways`."""
+    min_lat, max_lat, min_lon, max_lon = boxes
+    return (np.maximum(lats[p0], lats[p1]) >= min_lat[ways]) & \
+           (np.minimum(lats[p0], lats[p1]) <= max_lat[ways]) & \
+           (np.maximum(lons[p0], lons[p1]) >= min_lon[ways]) & \
+           (np.minimum(lons[p0], lons[p1]) <= max_lon[ways])
+
+def _vertex_segment_distance(lats, lons, offsets, boxes, a, b, max_elements):
+    """
+    For each pair, the minimum distance (in metres) from any vertex of way `a` to any edge of
+    way `b`, and whether the first vertex of `a` lies inside `b`. Coordinates are projected about
+    the first vertex of `a`.
+
+    Only vertices of `a` inside the buffered bounding box of `b` (and edges of `b` overlapping
+    the buffered bounding box of `a`) can be within the buffer distance, so the distance is
+    infinite for pairs with none. Vertex-edge combinations are processed at most
+    `max_elements` at a time.
+    """
+    min_lat, max_lat, min_lon, max_lon = boxes
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    # Vertices of `a` inside the buffered bounding box of `b`
+    v_pair, k = _expand(lengths[a])
+    vertex = starts[a][v_pair] + k
+    other = b[v_pair]
+    keep = (lats[vertex] >= min_lat[other]) & (lats[vertex] <= max_lat[other]) & \
+           (lons[vertex] >= min_lon[other]) & (lons[vertex] <= max_lon[other])
+    v_pair, vertex = v_pair[keep], vertex[keep]
+    e_pair, p0, p1 = _edges(offsets, b)
+    # Ray casting from the first vertex of `a` across every edge of `b`
+    ref_lat, ref_lon = lats[starts[a]], lons[starts[a]]
+    y0, y1 = lats[p0] - ref_lat[e_pair], lats[p1] - ref_lat[e_pair]
+    x0, x1 = lons[p0] - ref_lon[e_pair], lons[p1] - ref_lon[e_pair]
+    dy = y1 - y0
+    crosses = ((y0 > 0) != (y1 > 0)) & (x0 - y0 * (x1 - x0) / np.where(dy != 0, dy, 1.) > 0)
+    inside = np.bincount(e_pair, weights=crosses, minlength=len(a)) % 2 == 1
+    # Edges of `b` overlapping the buffered bounding box of `a`
+    keep = _edge_in_box(lats, lons, p0, p1, boxes, a[e_pair])
+    e_pair, p0, p1 = e_pair[keep], p0[keep], p1[keep]
+    # Distance from every remaining vertex to every remaining edge of each pair
+    n_vertices = np.bincount(v_pair, minlength=len(a))
+    n_edges = np.bincount(e_pair, minlength=len(a))
+    v_start, e_start = np.cumsum(n_vertices) - n_vertices, np.cumsum(n_edges) - n_edges
+    counts = n_vertices * n_edges
+    min_distance = np.full(len(a), np.inf)
+    for chunk in _chunks(counts, max_elements):
+        pair, k = _expand(counts[chunk])
+        pair += chunk.start
+        if len(pair) == 0:
+            continue
+        v = vertex[v_start[pair] + k // n_edges[pair]]
+        edge = e_start[pair] + k % n_edges[pair]
+        q0, q1 = p0[edge], p1[edge]
+        lat0, lon0 = ref_lat[pair], ref_lon[pair]
+        scale = METRES_PER_DEGREE * np.cos(np.radians(lat0))
+        px, py = (lons[v] - lon0) * scale, (lats[v] - lat0) * METRES_PER_DEGREE
+        x0, y0 = (lons[q0] - lon0) * scale, (lats[q0] - lat0) * METRES_PER_DEGREE
+        x1, y1 = (lons[q1] - lon0) * scale, (lats[q1] - lat0) * METRES_PER_DEGREE
+        dx, dy = x1 - x0, y1 - y0
+        seg_len2 = dx ** 2 + dy ** 2
+        t = np.clip(((px - x0) * dx + (py - y0) * dy) / np.where(seg_len2 > 0, seg_len2, 1.),
+                    0, 1)
+        distance = np.hypot(px - x0 - t * dx, py - y0 - t * dy)
+        chunk_counts = counts[chunk]
+        nonempty = chunk_counts > 0
+        block_starts = (np.cumsum(chunk_counts) - chunk_counts)[nonempty]
+        min_distance[np.flatnonzero(nonempty) + chunk.start] = \
+            np.minimum.reduceat(distance, block_starts)
+    return min_distance, inside
+
+def _orientation(lats, lons, o, u, v):
+    """Twice the signed area of each triangle o-u-v (positive if anticlockwise)."""
+    return (lons[u] - lons[o]) * (lats[v] - lats[o]) - (lats[u] - lats[o]) * (lons[v] - lons[o])
+
+def _edges_cross(lats, lons, offsets, boxes, a, b, max_elements):
+    """
+    For each pair, whether any edge of way `a` crosses any edge of way `b`, which catches
+    overlapping polygons with no vertex near the other's edges (e.g. two rectangles crossing in
+    a "+"). Only edges overlapping the buffered bounding box of the other way are compared, at
+    most `max_elements` edge-edge combinations at a time. Touching or collinear edges are left
+    to the distance test.
+    """
+    a_pair, a0, a1 = _edges(offsets, a)
+    keep = _edge_in_box(lats, lons, a0, a1, boxes, b[a_pair])
+    a_pair, a0, a1 = a_pair[keep], a0[keep], a1[keep]
+    b_pair, b0, b1 = _edges(offsets, b)
+    keep = _edge_in_box(lats, lons, b0, b1, boxes, a[b_pair])
+    b_pair, b0, b1 = b_pair[keep], b0[keep], b1[keep]
+    n_a = np.bincount(a_pair, minlength=len(a))
+    n_b = np.bincount(b_pair, minlength=len(a))
+    a_start, b_start = np.cumsum(n_a) - n_a, np.cumsum(n_b) - n_b
+    counts = n_a * n_b
+    crossed = np.zeros(len(a), dtype=bool)
+    for chunk in _chunks(counts, max_elements):
+        pair, k = _expand(counts[chunk])
+        pair += chunk.start
+        if len(pair) == 0:
+            continue
+        i = a_start[pair] + k // n_b[pair]
+        j = b_start[pair] + k % n_b[pair]
+        p, q, r, t = a0[i], a1[i], b0[j], b1[j]
+        cross = (_orientation(lats, lons, p, q, r) * _orientation(lats, lons, p, q, t) < 0) & \
+                (_orientation(lats, lons, r, t, p) * _orientation(lats, lons, r, t, q) < 0)
+        crossed |= np.bincount(pair, weights=cross, minlength=len(a)) > 0
+    return crossed
+
+def find_neighbours(objects, lats, lons, offsets, buffer_m=20., cell_m=100.,
+                    max_elements=1000000):
+    """
+    Find neighbouring ways from their geometry.
+
+    Parameters
+    ----------
+    `objects` : NumPy array
+        The OSM object (e.g. way URL) for each way.
+    `lats` : NumPy array
+        Concatenated node latitudes of all ways.
+    `lons` : NumPy array
+        Concatenated node longitudes of all ways.
+    `offsets` : NumPy array
+        Start index of each way in `lats` / `lons`, followed by `len(lats)`.
+    `buffer_m` : float
+        Ways whose polygons lie within this many metres of each other are neighbours.
+    `cell_m` : float
+        Size of the grid cells (in metres) used to find candidate pairs. Cells are never
+        smaller than twice the buffer distance.
+    `max_elements` : int
+        Maximum number of candidate pairs generated, or of nodes (and of node-edge
+        combinations) of candidate pairs checked, at once. This bounds memory use at roughly 200
+        bytes per element.
+
+    Returns
+    -------
+    Pandas DataFrame
+        Pairings with columns object and neighbour_object, listing each pair in both directions.
+
+    Examples
+    --------
+    Overlapping ways are neighbours even if no vertex of either lies near the other's edges and
+    neither starts inside the other, e.g. two 500 m squares offset by 100 m (a, b) and two thin
+    rectangles crossing in a "+" (c, d). Run with `python -m doctest find_neighbours.py`.
+
+    >>> def rectangle(lat_m, lon_m, half_height_m, half_width_m, first_corner=0):
+    ...     corners = np.roll([(-1, -1), (-1, 1), (1, 1), (1, -1)], -first_corner, axis=0)
+    ...     ring = np.vstack((corners, corners[:1]))
+    ...     return ((lat_m + ring[:, 0] * half_height_m) / METRES_PER_DEGREE,
+    ...             (lon_m + ring[:, 1] * half_width_m) / METRES_PER_DEGREE)
+    >>> ways = [rectangle(0, 0, 250, 250), rectangle(100, 100, 250, 250, first_corner=2),
+    ...         rectangle(5000, 0, 500, 5), rectangle(5000, 0, 5, 500)]
+    >>> lats, lons = np.concatenate([w[0] for w in ways]), np.concatenate([w[1] for w in ways])
+    >>> pairings = find_neighbours(np.array(["a", "b", "c", "d"]), lats, lons, np.arange(0, 21, 5))
+    >>> pairings.values.tolist()
+    [['a', 'b'], ['c', 'd'], ['b', 'a'], ['d', 'c']]
+    """
+    if len(objects) == 0:
+        return pd.DataFrame(columns=["object", "neighbour_object"])
+    boxes = _bounding_boxes(lats, lons, offsets, buffer_m)
+    a, b = candidate_pairs(lats, lons, offsets, buffer_m, cell_m, max_elements)
+    lengths = np.diff(offsets)
+    keep = np.zeros(len(a), dtype=bool)
+    for chunk in _chunks(lengths[a] + lengths[b], max_elements):
+        ca, cb = a[chunk], b[chunk]
+        dist_ab, a_in_b = _vertex_segment_distance(lats, lons, offsets, boxes, ca, cb,
+                                                   max_elements)
+        dist_ba, b_in_a = _vertex_segment_distance(lats, lons, offsets, boxes, cb, ca,
+                                                   max_elements)
+        near = (np.minimum(dist_ab, dist_ba) <= buffer_m) | a_in_b | b_in_a
+        far = ~near
+        near[far] = _edges_cross(lats, lons, offsets, boxes, ca[far], cb[far], max_elements)
+        keep[chunk] = near
+    a, b = a[keep], b[keep]
+    return pd.DataFrame({"object": objects[np.concatenate((a, b))],
+                         "neighbour_object": objects[np.concatenate((b, a))]})
+
+def main(input_file, output_file, buffer_m):
+    """
+    Find neighbouring ways from the geometry in a CSV and save the pairings to CSV.
+    """
+    pairings = find_neighbours(*load_way_geometry(input_file), buffer_m=buffer_m)
+    pairings.to_csv(output_file, index=False)
+    print(f"Found {len(pairings.index) // 2} pairs of neighbouring ways")
+
+def parse_options():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=("This is a command line interface (CLI) for "
+                                                  "the find_neighbours.py module"),
+                                     epilog="Jamie Taylor & Ethan Jones, 2026-10-19")
+    parser.add_argument("-f", "--input-file", dest="input_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the input CSV file of way geometry (columns "
+                             "objects, lats, lons).")
+    parser.add_argument("-o", "--output-file", dest="output_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the output pairings CSV file.")
+    parser.add_argument("-b", "--buffer", dest="buffer_m", action="store", type=float,
+                        default=20., metavar="<metres>",
+                        help="Specify the buffer distance in metres (default is 20).")
+    options = parser.parse_args()
+    if not os.path.isfile(options.input_file):
+        raise Exception(f"The input file '{options.input_file}' does not exist.")
+    return options
+
+if __name__ == "__main__":
+    OPTIONS = parse_options()
+    main(OPTIONS.input_file, OPTIONS.output_file, OPTIONS.buffer_m)
@@ -11,14 +11,24 @@ import os
 import argparse
 import pandas as pd
 
-def munge_groups(filename):
+from telemetry import Telemetry
+
+def munge_groups(filename, progress=None):
+    """
+    Load a file of REPD 1:1 pairings and restructure as groups. If given, `progress` is called
+    with no arguments after each pairing is processed.
+    """
+    return group_pairings(pd.read_csv(filename), progress)
+
+def group_pairings(pairings, progress=None):
     """
-    Load a file of REPD 1:1 pairings and restructure as groups.
+    Restructure a DataFrame of REPD 1:1 pairings (columns repd_id and neighbour_id) as groups.
     """
-    pairings = pd.read_csv(filename)
     groups = []
     processed = []
     for i in pairings.index:
+        if progress is not None:
+            progress()
         target = pairings.loc[[i], :]
         if target.repd_id.values[0] in processed:
             continue
@@ -41,12 +51,20 @@ def munge_groups(filename):
                            columns=["group_id", "repd_id"])
     return groups_
 
-def main(input_file, output_file):
+def main(input_file, output_file, telemetry_file=None):
     """
     Fix 1:1 pairings in REPD CSV file.
     """
-    groups = munge_groups(input_file)
-    groups.to_csv(output_file, index=False)
+    telemetry = Telemetry("fix_REPD_groupings", telemetry_file)
+    with telemetry.stage("read", total=1) as stage:
+        pairings = pd.read_csv(input_file)
+        stage.update()
+    with telemetry.stage("group", total=len(pairings.index)) as stage:
+        groups = group_pairings(pairings, progress=stage.update)
+    with telemetry.stage("write", total=len(groups.index)) as stage:
+        groups.to_csv(output_file, index=False)
+        stage.update(len(groups.index))
+    telemetry.finish()
 
 def parse_options():
     """Parse command line options."""
@@ -59,6 +77,9 @@ def parse_options():
     parser.add_argument("-o", "--output-file", dest="output_file", action="store", type=str,
                         required=True, metavar="</path/to/file>",
                         help="Specify the path to the output CSV file.")
+    parser.add_argument("--telemetry-file", dest="telemetry_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Optionally specify a file to append JSON-lines progress events to.")
     options = parser.parse_args()
     if not os.path.isfile(options.input_file):
         raise Exception(f"The input file '{options.input_file}' does not exist.")
@@ -66,4 +87,4 @@ def parse_options():
 
 if __name__ == "__main__":
     OPTIONS = parse_options()
-    main(OPTIONS.input_file, OPTIONS.output_file)
+    main(OPTIONS.input_file, OPTIONS.output_file, OPTIONS.telemetry_file)
@@ -10,16 +10,29 @@ Clean up the OSM neighbour pairings from Turing Institute.
 import os
 import argparse
 import pandas as pd
-from OSMPythonTools.api import Api
 
-def munge_groups(filename):
+from flask_ui.osm_api import get_client
+from telemetry import Telemetry
+from find_neighbours import load_way_geometry, find_neighbours
+from incremental_groupings import regroup, pairings_to_edges, connected_components
+
+def munge_groups(filename, progress=None):
+    """
+    Load a file of OSM object 1:1 pairings and restructure as groups. If given, `progress` is
+    called with no arguments after each pairing is processed.
+    """
+    return group_pairings(pd.read_csv(filename), progress)
+
+def group_pairings(pairings, progress=None):
     """
-    Load a file of OSM object 1:1 pairings and restructure as groups.
+    Restructure a DataFrame of OSM object 1:1 pairings (columns object and neighbour_object) as
+    groups.
     """
-    pairings = pd.read_csv(filename)
     groups = []
     processed = []
     for i in pairings.index:
+        if progress is not None:
+            progress()
         target = pairings.loc[[i], :]
         if target.object.values[0] in processed:
             continue
@@ -41,43 +54,115 @@ def munge_groups(filename):
                            columns=["id", "objects"])
     return groups_
 
-def fetch_osm_data(groups):
+def group_neighbours(pairings):
     """
-    Fetch ways/nodes from the OSM API.
+    Group a DataFrame of symmetric OSM object pairings (columns object and neighbour_object, e.g.
+    from find_neighbours.py) as the connected components of the pairings, using a union-find so
+    the time taken is linear in the number of pairings. Groups are numbered from 1 in order of
+    first appearance, in the same format as `group_pairings()`.
     """
-    osm = Api()
-    for i in groups.index:
-        way_id = groups.loc[i, "objects"].split("/")[-1]
-        way = osm.query(f"way/{way_id}")
-        latlons = [(n.lat(), n.lon()) for n in way.nodes()]
-        groups.loc[i, "lats"] = "|".join(map(str, [l[0] for l in latlons]))
-        groups.loc[i, "lons"] = "|".join(map(str, [l[1] for l in latlons]))
+    components = connected_components(pairings_to_edges(pairings))
+    rank = {obj: i for i, obj in enumerate(pd.unique(pairings.object.astype(str)))}
+    first_seen = lambda obj: rank.get(obj, len(rank))
+    components.sort(key=lambda group: min(map(first_seen, group)))
+    return pd.DataFrame([[i+1, obj] for i, group in enumerate(components)
+                         for obj in sorted(group, key=first_seen)], columns=["id", "objects"])
+
+def fetch_osm_data(groups, progress=None):
+    """
+    Fetch ways/nodes from the OSM API. If given, `progress` is called with no arguments after
+    each way is fetched.
+    """
+    osm = get_client()
+    way_ids = [obj.split("/")[-1] for obj in groups["objects"]]
+    all_latlons = osm.map(lambda way_id: osm.way_latlons(way_id, cache=False), way_ids,
+                          callback=progress)
+    groups["lats"] = ["|".join(map(str, [l[0] for l in latlons])) for latlons in all_latlons]
+    groups["lons"] = ["|".join(map(str, [l[1] for l in latlons])) for latlons in all_latlons]
     return groups
 
-def main(input_file, output_file):
+def main(input_file, output_file, telemetry_file=None, geometry_file=None, buffer_m=20.,
+         state_file=None, revalidate=False):
     """
-    Fix 1:1 pairings in OSM CSV file.
+    Fix 1:1 pairings in OSM CSV file. Alternatively, pass `geometry_file` (a CSV with columns
+    objects, lats and lons) instead of `input_file` to pair up ways within `buffer_m` metres of
+    each other, in which case the ways' geometry is taken from the file rather than the OSM API.
+    Pass `state_file` to group `input_file` incrementally against the previous run's state (see
+    incremental_groupings.py).
     """
-    groups = munge_groups(input_file)
-    groups_with_latlons = fetch_osm_data(groups)
-    groups_with_latlons.to_csv(output_file, index=False)
+    telemetry = Telemetry("fix_groupings", telemetry_file, api_stats=get_client().stats)
+    if state_file is not None:
+        regroup(input_file, output_file, state_file, telemetry, revalidate)
+        telemetry.finish()
+        return
+    if geometry_file is not None:
+        with telemetry.stage("read", total=1) as stage:
+            objects, lats, lons, offsets = load_way_geometry(geometry_file)
+            stage.update()
+        with telemetry.stage("pair", total=len(objects)) as stage:
+            pairings = find_neighbours(objects, lats, lons, offsets, buffer_m=buffer_m)
+            stage.update(len(objects))
+        with telemetry.stage("group", total=len(pairings.index)) as stage:
+            groups = group_neighbours(pairings)
+            stage.update(len(pairings.index))
+        geometry = pd.read_csv(geometry_file, usecols=["objects", "lats", "lons"])
+        groups_with_latlons = groups.merge(geometry.drop_duplicates("objects"), how="left",
+                                           on="objects")
+    else:
+        with telemetry.stage("read", total=1) as stage:
+            pairings = pd.read_csv(input_file)
+            stage.update()
+        with telemetry.stage("group", total=len(pairings.index)) as stage:
+            groups = group_pairings(pairings, progress=stage.update)
+        with telemetry.stage("fetch", total=len(groups.index)) as stage:
+            groups_with_latlons = fetch_osm_data(groups, progress=stage.update)
+    with telemetry.stage("write", total=len(groups_with_latlons.index)) as stage:
+        groups_with_latlons.to_csv(output_file, index=False)
+        stage.update(len(groups_with_latlons.index))
+    telemetry.finish()
 
 def parse_options():
     """Parse command line options."""
     parser = argparse.ArgumentParser(description=("This is a command line interface (CLI) for "
                                                   "the fix_groupings.py module"),
                                      epilog="Jamie Taylor & Ethan Jones, 2020-03-04")
-    parser.add_argument("-f", "--input-file", dest="input_file", action="store", type=str,
-                        required=True, metavar="</path/to/file>",
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("-f", "--input-file", dest="input_file", action="store", type=str,
+                        metavar="</path/to/file>",
                         help="Specify the path to the input CSV file.")
+    inputs.add_argument("-g", "--geometry-file", dest="geometry_file", action="store", type=str,
+                        metavar="</path/to/file>",
+                        help="Alternatively, specify the path to a CSV file of way geometry "
+                             "(columns objects, lats, lons) to pair up neighbouring ways "
+                             "directly.")
     parser.add_argument("-o", "--output-file", dest="output_file", action="store", type=str,
                         required=True, metavar="</path/to/file>",
                         help="Specify the path to the output CSV file.")
+    parser.add_argument("--telemetry-file", dest="telemetry_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Optionally specify a file to append JSON-lines progress events to.")
+    parser.add_argument("-b", "--buffer", dest="buffer_m", action="store", type=float,
+                        default=20., metavar="<metres>",
+                        help="With --geometry-file, ways within this many metres of each other "
+                             "are neighbours (default is 20).")
+    parser.add_argument("-s", "--state-file", dest="state_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Group the input file incrementally, only regrouping and fetching "
+                             "what changed since the run that saved this state file (created if "
+                             "it doesn't exist). Group IDs are kept where membership is "
+                             "unchanged.")
+    parser.add_argument("--revalidate", dest="revalidate", action="store_true",
+                        help="With --state-file, also re-request previously fetched ways "
+                             "(conditionally) to pick up changes on OSM.")
     options = parser.parse_args()
-    if not os.path.isfile(options.input_file):
-        raise Exception(f"The input file '{options.input_file}' does not exist.")
+    if options.state_file is not None and options.input_file is None:
+        raise Exception("The --state-file option can only be used with --input-file.")
+    for filename in (options.input_file, options.geometry_file):
+        if filename is not None and not os.path.isfile(filename):
+            raise Exception(f"The input file '{filename}' does not exist.")
     return options
 
 if __name__ == "__main__":
     OPTIONS = parse_options()
-    main(OPTIONS.input_file, OPTIONS.output_file)
+    main(OPTIONS.input_file, OPTIONS.output_file, OPTIONS.telemetry_file, OPTIONS.geometry_file,
+         OPTIONS.buffer_m, OPTIONS.state_file, OPTIONS.revalidate)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Vectorised geometry metrics for OSM ways and automatic plausibility flags for OSM-REPD matches.
+
+Way geometries are held as ragged arrays (all node coordinates concatenated, plus an array of
+offsets marking where each way starts), projected to metres about each way's mean position and
+reduced per way with NumPy, so there is no Python loop over ways.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from repd import load_repd
+from osm_api import get_client, OSMAPIError
+
+EARTH_RADIUS = 6371008.8 # mean Earth radius in metres
+# Codes from osm_validator.FLAG_CODES_REPD_OSM_MATCHES
+FLAG_MISSING_WAY = 3
+FLAG_WRONG_WAY = 6
+
+def to_ragged(latlons):
+    """
+    Convert a list of ways (each a list of (lat, lon) tuples) to ragged arrays.
+
+    Returns
+    -------
+    tuple of NumPy arrays
+        (lats, lons, offsets) where the nodes of way `i` are `lats[offsets[i]:offsets[i+1]]`.
+    """
+    lengths = np.array([len(way) for way in latlons], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    coords = np.array([node for way in latlons for node in way], dtype=np.float64).reshape(-1, 2)
+    return coords[:, 0], coords[:, 1], offsets
+
+def polygon_metrics(lats, lons, offsets):
+    """
+    Compute the area, centroid and bounding box of many polygons at once.
+
+    Parameters
+    ----------
+    `lats` : NumPy array
+        Concatenated node latitudes (degrees) of all polygons.
+    `lons` : NumPy array
+        Concatenated node longitudes (degrees) of all polygons.
+    `offsets` : NumPy array
+        Start index of each polygon in `lats` / `lons`, followed by `len(lats)`.
+
+    Returns
+    -------
+    Pandas DataFrame
+        One row per polygon with columns: area_m2, centroid_lat, centroid_lon, min_lat, max_lat,
+        min_lon, max_lon. Polygons with no nodes are given NaNs.
+    """
+    lengths = np.diff(offsets)
+    valid = lengths > 0
+    metrics = pd.DataFrame(np.nan, index=np.arange(len(lengths)),
+                           columns=["area_m2", "centroid_lat", "centroid_lon", "min_lat",
+                                    "max_lat", "min_lon", "max_lon"])
+    if not valid.any():
+        return metrics
+    starts = offsets[:-1][valid]
+    n_nodes = lengths[valid]
+    way_index = np.repeat(np.arange(len(starts)), n_nodes)
+    # Local equirectangular projection about each polygon's mean position
+    lat0 = np.add.reduceat(lats, starts) / n_nodes
+    lon0 = np.add.reduceat(lons, starts) / n_nodes
+    coslat0 = np.cos(np.radians(lat0))
+    x = EARTH_RADIUS * np.radians(lons - lon0[way_index]) * coslat0[way_index]
+    y = EARTH_RADIUS * np.radians(lats - lat0[way_index])
+    # Shoelace, wrapping the last node of each polygon back to its first
+    nxt = np.arange(1, len(x) + 1)
+    nxt[starts + n_nodes - 1] = starts
+    cross = x * y[nxt] - x[nxt] * y
+    area2 = np.add.reduceat(cross, starts)
+    degenerate = np.abs(area2) < 1e-6
+    safe_area2 = np.where(degenerate, 1., area2)
+    cx = np.where(degenerate, 0., np.add.reduceat((x + x[nxt]) * cross, starts) / (3 * safe_area2))
+    cy = np.where(degenerate, 0., np.add.reduceat((y + y[nxt]) * cross, starts) / (3 * safe_area2))
+    metrics.loc[valid, "area_m2"] = np.abs(area2) / 2
+    metrics.loc[valid, "centroid_lat"] = lat0 + np.degrees(cy / EARTH_RADIUS)
+    metrics.loc[valid, "centroid_lon"] = lon0 + np.degrees(cx / (EARTH_RADIUS * coslat0))
+    metrics.loc[valid, "min_lat"] = np.minimum.reduceat(lats, starts)
+    metrics.loc[valid, "max_lat"] = np.maximum.reduceat(lats, starts)
+    metrics.loc[valid, "min_lon"] = np.minimum.reduceat(lons, starts)
+    metrics.loc[valid, "max_lon"] = np.maximum.reduceat(lons, starts)
+    return metrics
+
+def combine_metrics(metrics, groups):
+    """
+    Combine the metrics of several polygons into one row per group, e.g. the member ways of a
+    relation: areas are summed, centroids are area-weighted (or a plain mean if the total area is
+    zero) and bounding boxes are merged. Inner rings are counted as area, not subtracted.
+
+    Parameters
+    ----------
+    `metrics` : Pandas DataFrame
+        Output of `polygon_metrics()`.
+    `groups` : array-like
+        The group of each row of `metrics`.
+
+    Returns
+    -------
+    Pandas DataFrame
+        One row per group, indexed by group, with the columns of `polygon_metrics()`. Polygons
+        with no nodes are ignored.
+    """
+    metrics = metrics.assign(group=np.asarray(groups)).dropna(subset=["area_m2"])
+    metrics = metrics.assign(weighted_lat=metrics.centroid_lat * metrics.area_m2,
+                             weighted_lon=metrics.centroid_lon * metrics.area_m2)
+    grouped = metrics.groupby("group")
+    combined = grouped.agg(area_m2=("area_m2", "sum"), weighted_lat=("weighted_lat", "sum"),
+                           weighted_lon=("weighted_lon", "sum"), mean_lat=("centroid_lat", "mean"),
+                           mean_lon=("centroid_lon", "mean"), min_lat=("min_lat", "min"),
+                           max_lat=("max_lat", "max"), min_lon=("min_lon", "min"),
+                           max_lon=("max_lon", "max"))
+    has_area = combined.area_m2 > 0
+    safe_area = combined.area_m2.where(has_area, 1.)
+    combined["centroid_lat"] = np.where(has_area, combined.weighted_lat / safe_area,
+                                        combined.mean_lat)
+    combined["centroid_lon"] = np.where(has_area, combined.weighted_lon / safe_area,
+                                        combined.mean_lon)
+    return combined[["area_m2", "centroid_lat", "centroid_lon", "min_lat", "max_lat", "min_lon",
+                     "max_lon"]]
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great circle distance in metres between arrays of points (in degrees)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+def match_metrics(matches, repd_df, way_metrics, max_distance=1000., min_density=0.1,
+                  max_density=2.):
+    """
+    Compute plausibility metrics and suggested flags for each OSM-REPD match.
+
+    Parameters
+    ----------
+    `matches` : Pandas DataFrame
+        The matches, with (at least) columns osm_objtype, osm_id and repd_id.
+    `repd_df` : Pandas DataFrame
+        The REPD, as returned by `repd.load_repd()`.
+    `way_metrics` : Pandas DataFrame
+        Output of `fetch_osm_metrics()`: the columns of `polygon_metrics()`, indexed by
+        (osm_objtype, osm_id). Matches to objects not in the index (e.g. nodes) get NaN metrics
+        and are not flagged.
+    `max_distance` : float
+        Matches whose way centroid is further than this (in metres) from the REPD location are
+        flagged as "Wrong way".
+    `min_density` : float
+        Matches whose REPD capacity per hectare of matched ways (MW/ha) is below this are flagged
+        as "Wrong way" (the ways cover much more than the system).
+    `max_density` : float
+        Matches whose capacity density is above this are flagged as "Missing system/way" (the
+        ways don't cover the whole system).
+
+    Returns
+    -------
+    Pandas DataFrame
+        `matches` with the columns of `way_metrics` plus repd_distance_m,
+        capacity_density_mw_per_ha and suggested_flags (pipe-separated flag codes) appended.
+    """
+    repd = repd_df[["id", "dc_capacity", "latitude", "longitude"]].rename(
+        columns={"id": "repd_id", "latitude": "repd_latitude", "longitude": "repd_longitude"})
+    repd = repd.astype({"repd_id": "float64", "dc_capacity": "float64", "repd_latitude": "float64",
+                        "repd_longitude": "float64"})
+    flagged = matches.astype({"repd_id": "float64", "osm_id": "float64"}).merge(
+        repd, how="left", on="repd_id")
+    flagged = flagged.join(way_metrics, on=["osm_objtype", "osm_id"])
+    flagged["repd_distance_m"] = haversine(flagged.centroid_lat.to_numpy(),
+                                           flagged.centroid_lon.to_numpy(),
+                                           flagged.repd_latitude.to_numpy(),
+                                           flagged.repd_longitude.to_numpy())
+    unique_objects = flagged.drop_duplicates(["repd_id", "osm_objtype", "osm_id"])
+    repd_area = unique_objects.groupby("repd_id").area_m2.sum()
+    hectares = flagged.repd_id.map(repd_area).to_numpy() / 1e4
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flagged["capacity_density_mw_per_ha"] = np.where(hectares > 0,
+                                                         flagged.dc_capacity / hectares, np.nan)
+    wrong_way = (flagged.repd_distance_m > max_distance) | \
+                (flagged.capacity_density_mw_per_ha < min_density)
+    missing_way = flagged.capacity_density_mw_per_ha > max_density
+    flagged["suggested_flags"] = np.select(
+        [wrong_way & missing_way, wrong_way, missing_way],
+        [f"{FLAG_MISSING_WAY}|{FLAG_WRONG_WAY}", str(FLAG_WRONG_WAY), str(FLAG_MISSING_WAY)],
+        default="")
+    return flagged.drop(columns=["dc_capacity", "repd_latitude", "repd_longitude"])
+
+def fetch_way_metrics(way_ids):
+    """Fetch way geometries from the OSM API and compute their metrics, indexed by osm_id."""
+    osm = get_client()
+    def way_latlons(way_id):
+        try:
+            return osm.way_latlons(way_id, cache=False)
+        except OSMAPIError:
+            return []
+    way_ids = list(way_ids)
+    metrics = polygon_metrics(*to_ragged(osm.map(way_latlons, way_ids)))
+    metrics.index = pd.Index(way_ids, dtype="float64", name="osm_id")
+    return metrics
+
+def fetch_relation_metrics(relation_ids):
+    """
+    Fetch the member ways of relations from the OSM API and combine their metrics (see
+    `combine_metrics()`), indexed by osm_id. Relations that can't be fetched get NaN metrics.
+    """
+    osm = get_client()
+    def member_ids(relation_id):
+        try:
+            return osm.relation_member_ids(relation_id)
+        except OSMAPIError:
+            return []
+    relation_ids = list(relation_ids)
+    members = osm.map(member_ids, relation_ids)
+    relations = np.repeat(np.array(relation_ids, dtype=np.float64), [len(m) for m in members])
+    member_ways = np.array([m for relation in members for m in relation], dtype=np.int64)
+    unique_ways, inverse = np.unique(member_ways, return_inverse=True)
+    way_metrics = fetch_way_metrics(unique_ways)
+    metrics = combine_metrics(way_metrics.iloc[inverse].reset_index(drop=True), relations)
+    return metrics.reindex(pd.Index(relation_ids, dtype="float64", name="osm_id"))
+
+def fetch_osm_metrics(matches):
+    """
+    Compute the metrics of the ways and relations in a matches frame, indexed by
+    (osm_objtype, osm_id). A relation's metrics combine those of its member ways.
+    """
+    fetchers = {"way": fetch_way_metrics, "relation": fetch_relation_metrics}
+    frames = []
+    for objtype, fetch in fetchers.items():
+        ids = matches.loc[(matches.osm_objtype == objtype) & matches.osm_id.notnull(), "osm_id"]
+        metrics = fetch(ids.unique().astype(np.int64))
+        frames.append(metrics.set_index(pd.Index([objtype] * len(metrics.index),
+                                                 name="osm_objtype"), append=True))
+    metrics = pd.concat(frames)
+    return metrics.reorder_levels(["osm_objtype", "osm_id"])
+
+def main(input_file, output_file, repd_file, max_distance, min_density, max_density):
+    """
+    Add geometry metrics and suggested flags to an OSM-REPD matches CSV, ready for upload to the
+    OSM-REPD matches validation tool.
+    """
+    matches = pd.read_csv(input_file, low_memory=False)
+    way_metrics = fetch_osm_metrics(matches)
+    repd_df = load_repd(repd_file)
+    flagged = match_metrics(matches, repd_df, way_metrics, max_distance, min_density, max_density)
+    flagged.to_csv(output_file, index=False)
+    print(f"Flagged {(flagged.suggested_flags != '').sum()} of {len(flagged.index)} matches")
+
+def parse_options():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=("This is a command line interface (CLI) for "
+                                                  "the geometry_metrics.py module"),
+                                     epilog="Jamie Taylor & Ethan Jones, 2026-10-19")
+    parser.add_argument("-f", "--input-file", dest="input_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the input OSM-REPD matches CSV file.")
+    parser.add_argument("-o", "--output-file", dest="output_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the output CSV file.")
+    parser.add_argument("-r", "--repd-file", dest="repd_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the REPD file.")
+    parser.add_argument("--max-distance", dest="max_distance", action="store", type=float,
+                        default=1000., help="Flag ways further than this many metres from the "
+                                            "REPD location (default is 1000).")
+    parser.add_argument("--min-density", dest="min_density", action="store", type=float,
+                        default=0.1, help="Flag matches with fewer MW per hectare of matched ways "
+                                          "than this (default is 0.1).")
+    parser.add_argument("--max-density", dest="max_density", action="store", type=float,
+                        default=2., help="Flag matches with more MW per hectare of matched ways "
+                                         "than this (default is 2).")
+    options = parser.parse_args()
+    if not os.path.isfile(options.input_file):
+        raise Exception(f"The input file '{options.input_file}' does not exist.")
+    return options
+
+if __name__ == "__main__":
+    OPTIONS = parse_options()
+    main(OPTIONS.input_file, OPTIONS.output_file, OPTIONS.repd_file, OPTIONS.max_distance,
+         OPTIONS.min_density, OPTIONS.max_density)
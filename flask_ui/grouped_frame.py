@@ -0,0 +1,110 @@
+"""
+A DataFrame split into groups without copying it.
+
+The frame is stored once, sorted by the group key, alongside an array of offsets marking where
+each group starts. Indexing returns a row slice of the shared frame rather than a copy.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import numpy as np
+import pandas as pd
+
+class GroupedFrame:
+    """
+    A DataFrame grouped by one column, with groups in order of first appearance. Rows with a
+    null key are dropped.
+
+    Parameters
+    ----------
+    `frame` : Pandas DataFrame
+        The data to group.
+    `key` : string
+        The column to group by.
+
+    Notes
+    -----
+    Building is a single factorize and a stable sort. Use `save()` / `load()` to serialise to a
+    columnar (NumPy .npz) file rather than pickling the groups.
+    """
+    def __init__(self, frame, key):
+        frame = frame[frame[key].notnull()]
+        codes, keys = pd.factorize(frame[key])
+        order = np.argsort(codes, kind="stable")
+        self.frame = frame.iloc[order]
+        self.key = key
+        self.keys = np.asarray(keys)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(codes[order],
+                                                                  minlength=len(keys)))))
+
+    @classmethod
+    def _from_parts(cls, frame, key, keys, offsets):
+        grouped = cls.__new__(cls)
+        grouped.frame = frame
+        grouped.key = key
+        grouped.keys = keys
+        grouped.offsets = offsets
+        return grouped
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.keys):
+            raise IndexError(f"Group index {index} out of range")
+        return self.frame.iloc[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(len(self.keys)):
+            yield self[index]
+
+    def save(self, filename):
+        """
+        Save to a columnar .npz file. Numeric and NumPy bool columns round-trip unchanged. Columns
+        of booleans with nulls (object or nullable "boolean" dtype) are stored as bools with a null
+        mask and load as the nullable "boolean" dtype. Any other column is stored as strings with
+        a null mask, so it loads as an object column of strings (e.g. dates or mixed types come
+        back as their string representation) with None for nulls.
+        """
+        arrays = {"__key__": np.array(self.key), "__keys__": self.keys,
+                  "__offsets__": self.offsets, "__index__": self.frame.index.to_numpy(),
+                  "__columns__": np.array(self.frame.columns, dtype=str)}
+        for i, column in enumerate(self.frame.columns):
+            values = self.frame[column]
+            if values.dtype == bool:
+                arrays[f"col{i}"] = values.to_numpy()
+            elif pd.api.types.infer_dtype(values, skipna=True) == "boolean":
+                nulls = values.isnull().to_numpy()
+                values = np.where(nulls, False, values.to_numpy(dtype=object))
+                arrays[f"col{i}"] = values.astype(bool)
+                arrays[f"bool{i}"] = nulls
+            elif pd.api.types.is_numeric_dtype(values):
+                arrays[f"col{i}"] = values.to_numpy()
+            else:
+                arrays[f"col{i}"] = values.astype(str).to_numpy(dtype=str)
+                arrays[f"null{i}"] = values.isnull().to_numpy()
+        if self.keys.dtype == object:
+            arrays["__keys__"] = self.keys.astype(str)
+        with open(filename, "wb") as fid:
+            np.savez(fid, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """Load a GroupedFrame saved with `save()`."""
+        with np.load(filename, allow_pickle=False) as data:
+            columns = data["__columns__"].tolist()
+            frame = {}
+            for i, column in enumerate(columns):
+                values = data[f"col{i}"]
+                if f"bool{i}" in data.files:
+                    values = pd.array(values, dtype="boolean")
+                    values[data[f"bool{i}"]] = pd.NA
+                elif f"null{i}" in data.files:
+                    values = values.astype(object)
+                    values[data[f"null{i}"]] = None
+                frame[column] = values
+            frame = pd.DataFrame(frame, index=data["__index__"], columns=columns)
+            return cls._from_parts(frame, str(data["__key__"]), data["__keys__"],
+                                   data["__offsets__"])
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+A replayable load test for the Flask validation UI (`osm_validator.APP`).
+
+The app is served in-process with its OSM API calls pointed at a local stand-in server
+(`osm_stub_server.py`) with configurable latency and throttling. Synthetic upload files are
+generated for the chosen validation tool and scripted reviewer sessions upload, page through and
+submit concurrently. The latency percentiles of each route and the submit throughput are reported
+and can be saved as a baseline, or compared against one to flag regressions.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+from contextlib import redirect_stdout
+from urllib.parse import urlsplit, urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from osm_stub_server import StubOSMServer, synthetic_way
+
+# Route, upload form field and submitted validation for each validation tool
+TOOLS = {
+    "groups": ("validate_osm_groups", "osmGroupsFile", "yes"),
+    "matches": ("validate_osm_repd_matches", "osmWayFile", "correct"),
+    "disagreements": ("validate_osm_repd_disagreement_matches", "osmWayFile", "turing"),
+}
+PERCENTILES = (50, 95, 99)
+FIRST_WAY_ID = 1000000
+FIRST_REPD_ID = 1
+
+def synthetic_upload(tool, n_pages, ways_per_page=3):
+    """
+    Generate an upload file for a validation tool, with `n_pages` pages to review of
+    `ways_per_page` ways each. Way geometry matches what the stand-in OSM API serves.
+
+    Returns
+    -------
+    tuple
+        (upload, repd) where upload is a Pandas DataFrame in the tool's upload format and repd
+        is a synthetic REPD DataFrame (in the format returned by `repd.load_repd`) covering the
+        REPD ids it refers to.
+    """
+    rows = []
+    for page in range(n_pages):
+        repd_id = FIRST_REPD_ID + 2 * page
+        for k in range(ways_per_page):
+            way_id = FIRST_WAY_ID + page * ways_per_page + k
+            nodes, _ = synthetic_way(way_id)
+            lats = [n["lat"] for n in nodes] + [nodes[0]["lat"]]
+            lons = [n["lon"] for n in nodes] + [nodes[0]["lon"]]
+            if tool == "groups":
+                rows.append({"id": page, "objects": f"https://www.openstreetmap.org/way/{way_id}",
+                             "lats": "|".join(map(str, lats)), "lons": "|".join(map(str, lons))})
+            elif tool == "matches":
+                rows.append({"osm_id": way_id, "repd_id": repd_id, "osm_objtype": "way",
+                             "latitude": np.mean(lats), "longitude": np.mean(lons)})
+            else:
+                # Turing and Soton disagree on every sol_id, so none are resolved automatically
+                rows.append({"sol_id": page, "osm_id": way_id, "soton_repd_id": repd_id,
+                             "turing_repd_id": repd_id + 1, "latitude": np.mean(lats),
+                             "longitude": np.mean(lons)})
+    upload = pd.DataFrame(rows)
+    n_repd = 2 * n_pages
+    rng = np.random.default_rng(n_pages)
+    repd = pd.DataFrame({
+        "id": np.arange(FIRST_REPD_ID, FIRST_REPD_ID + n_repd),
+        "site_name": [f"Synthetic Solar Farm {i}" for i in range(n_repd)],
+        "install_date": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 2000, n_repd),
+                                                                      unit="D"),
+        "dc_capacity": rng.uniform(0.1, 50., n_repd).round(2),
+        "funding_route": "FiT",
+        "fit_registered": True,
+        "latitude": rng.uniform(50.5, 55., n_repd),
+        "longitude": rng.uniform(-4., 1., n_repd),
+        "source": "repd",
+    })
+    return upload, repd
+
+def start_app(osm_url, work_dir, repd=None, repd_file=None):
+    """
+    Serve `osm_validator.APP` from a background thread, with its OSM API calls sent to `osm_url`
+    and its cache and results written to `work_dir`. The REPD is read from `repd_file` if given,
+    otherwise `repd` (a DataFrame) is served in its place.
+
+    Returns
+    -------
+    werkzeug BaseWSGIServer
+        The running server. Call its `shutdown()` method to stop it.
+    """
+    from werkzeug.serving import make_server
+    import osm_api
+    import osm_validator
+    osm_api.set_client(osm_api.OSMClient(osm_url))
+    osm_validator.ROOT_PATH = work_dir
+    os.makedirs(os.path.join(work_dir, "results"), exist_ok=True)
+    if repd_file is not None:
+        osm_validator.REPD_FILE = repd_file
+    else:
+        osm_validator.load_repd = lambda *args, **kwargs: repd.copy()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, osm_validator.APP, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _multipart(field, filename, content):
+    """Encode a single file upload as a multipart/form-data body."""
+    boundary = f"----osmpv{random.getrandbits(64):016x}"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+            f"filename=\"{filename}\"\r\nContent-Type: application/octet-stream\r\n\r\n"
+            ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+class Recorder:
+    """Thread-safe record of the latency and status of every request, by route."""
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, latency, ok):
+        """Record one request."""
+        with self._lock:
+            self.latencies.setdefault(route, []).append(latency)
+            self.errors[route] = self.errors.get(route, 0) + (not ok)
+
+class ReviewerSession:
+    """
+    A scripted reviewer: optionally uploads a file, then for each of its pages loads the page,
+    pauses and submits a validation.
+
+    Parameters
+    ----------
+    `base_url` : string
+        URL of the Flask app, e.g. "http://127.0.0.1:5000".
+    `tool` : string
+        One of the keys of `TOOLS`.
+    `pages` : list
+        Page indices to review, in order.
+    `recorder` : Recorder
+        Where to record request latencies.
+    `upload` : tuple
+        Optionally, (filename, content) of a file to upload before reviewing.
+    `think_time` : float
+        Mean pause (in seconds) between loading a page and submitting it.
+    `timeout` : float
+        Socket timeout (in seconds) for each request.
+    """
+    def __init__(self, base_url, tool, pages, recorder, upload=None, think_time=0., timeout=300.):
+        self.host = urlsplit(base_url).netloc
+        self.route, self.field, self.validation = TOOLS[tool]
+        self.pages = list(pages)
+        self.recorder = recorder
+        self.upload = upload
+        self.think_time = think_time
+        self.timeout = timeout
+
+    def _request(self, name, method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection(self.host, timeout=self.timeout)
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (http.client.HTTPException, OSError):
+            ok = False
+        finally:
+            conn.close()
+        self.recorder.add(name, time.perf_counter() - start, ok)
+        return ok
+
+    def run(self):
+        """Run the session, returning the number of successful submits."""
+        first_page = self.pages[0] if self.pages else 0
+        if self.upload is not None:
+            body, content_type = _multipart(self.field, *self.upload)
+            self._request(f"{self.route} upload", "POST", f"/{self.route}/{first_page}", body,
+                          {"Content-Type": content_type})
+        submits = 0
+        for page in self.pages:
+            self._request(f"{self.route} page", "GET", f"/{self.route}/{page}")
+            if self.think_time:
+                time.sleep(random.uniform(0, 2 * self.think_time))
+            form = urlencode([("is_valid", self.validation), ("flag", 1)])
+            submits += self._request(f"{self.route} submit", "POST", f"/{self.route}/{page}",
+                                     form, {"Content-Type": "application/x-www-form-urlencoded"})
+        return submits
+
+def run_sessions(base_url, tool, upload, n_pages, n_sessions=4, upload_per_session=False,
+                 think_time=0.):
+    """
+    Run concurrent reviewer sessions against the app, splitting the pages between them.
+
+    Parameters
+    ----------
+    `upload` : tuple
+        (filename, content) of the file to upload.
+    `upload_per_session` : bool
+        If True, every session uploads the file concurrently. Otherwise, it is uploaded once
+        before the sessions start.
+
+    Returns
+    -------
+    tuple
+        (recorder, submits, elapsed) where elapsed is the wall time (in seconds) of the
+        concurrent reviewing.
+    """
+    recorder = Recorder()
+    if not upload_per_session:
+        ReviewerSession(base_url, tool, [], recorder, upload=upload).run()
+    sessions = [ReviewerSession(base_url, tool, pages, recorder,
+                                upload=upload if upload_per_session else None,
+                                think_time=think_time)
+                for pages in np.array_split(np.arange(n_pages), n_sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_sessions) as executor:
+        submits = sum(executor.map(lambda session: session.run(), sessions))
+    return recorder, submits, time.perf_counter() - start
+
+def summarise(recorder, submits, elapsed):
+    """
+    Summarise a run as a dict with the count, error count, mean and p50/p95/p99 latency (in ms)
+    of each route, and the submit throughput (submits/sec).
+    """
+    routes = {}
+    for route, latencies in sorted(recorder.latencies.items()):
+        latencies = np.array(latencies) * 1000.
+        routes[route] = {"count": len(latencies), "errors": recorder.errors[route],
+                         "mean_ms": round(float(latencies.mean()), 3)}
+        for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+            routes[route][f"p{p}_ms"] = round(float(value), 3)
+    return {"routes": routes, "submits": submits, "elapsed": round(elapsed, 3),
+            "submit_throughput": round(submits / elapsed, 3) if elapsed > 0 else 0.}
+
+def compare_to_baseline(summary, baseline, tolerance=0.2, min_delta_ms=5.):
+    """
+    Compare a run summary with a baseline summary.
+
+    Parameters
+    ----------
+    `tolerance` : float
+        Fractional slow-down (of any percentile latency) or drop in submit throughput allowed
+        before it is flagged as a regression.
+    `min_delta_ms` : float
+        Latency increases smaller than this many ms are never flagged (timer noise).
+
+    Returns
+    -------
+    list
+        A description of each regression (empty if there are none).
+    """
+    regressions = []
+    if summary.get("config") != baseline.get("config"):
+        print("WARNING: the baseline was recorded with a different configuration")
+    for route, base in baseline["routes"].items():
+        current = summary["routes"].get(route)
+        if current is None:
+            regressions.append(f"{route}: no requests were made")
+            continue
+        for p in PERCENTILES:
+            key = f"p{p}_ms"
+            if current[key] > base[key] * (1 + tolerance) and \
+               current[key] - base[key] > min_delta_ms:
+                regressions.append(f"{route}: {key} {current[key]:.1f} ms (baseline "
+                                   f"{base[key]:.1f} ms)")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{route}: {current['errors']} errors (baseline "
+                               f"{base['errors']})")
+    if summary["submit_throughput"] < baseline["submit_throughput"] * (1 - tolerance):
+        regressions.append(f"submit throughput {summary['submit_throughput']:.2f}/s (baseline "
+                           f"{baseline['submit_throughput']:.2f}/s)")
+    return regressions
+
+def print_summary(summary):
+    """Print a table of per-route latencies and the submit throughput."""
+    print(f"{'route':<52}{'count':>7}{'errors':>8}" +
+          "".join(f"{'p' + str(p) + ' (ms)':>12}" for p in PERCENTILES))
+    for route, stats in summary["routes"].items():
+        print(f"{route:<52}{stats['count']:>7}{stats['errors']:>8}" +
+              "".join(f"{stats['p' + str(p) + '_ms']:>12.1f}" for p in PERCENTILES))
+    print(f"{summary['submits']} submits in {summary['elapsed']:.2f} s "
+          f"({summary['submit_throughput']:.2f} submits/s)")
+    osm = summary.get("osm")
+    if osm:
+        print(f"Stand-in OSM API: {osm['requests']} requests, {osm['throttled']} throttled")
+
+def main(tool, n_pages=100, ways_per_page=3, n_sessions=4, upload_per_session=False,
+         think_time=0., latency=0., throttle_every=0, retry_after=0., upload_file=None,
+         repd_file=None, output_file=None, baseline_file=None, save_baseline=False,
+         tolerance=0.2, verbose=False):
+    """
+    Run a load test of one of the validation tools and report (and optionally save or compare
+    against a baseline) the results. Returns the list of regressions against the baseline.
+    """
+    config = {"tool": tool, "n_pages": n_pages, "ways_per_page": ways_per_page,
+              "n_sessions": n_sessions, "upload_per_session": upload_per_session,
+              "think_time": think_time, "latency": latency, "throttle_every": throttle_every,
+              "upload_file": upload_file}
+    upload, repd = synthetic_upload(tool, n_pages, ways_per_page)
+    if upload_file is not None:
+        with open(upload_file, "rb") as fid:
+            upload = (os.path.basename(upload_file), fid.read())
+    else:
+        upload = (f"synthetic_{tool}.csv", upload.to_csv(index=False).encode("utf-8"))
+    stub = StubOSMServer(latency=latency, throttle_every=throttle_every,
+                         retry_after=retry_after).start()
+    with tempfile.TemporaryDirectory() as work_dir:
+        app = start_app(stub.url, work_dir, repd=repd, repd_file=repd_file)
+        base_url = f"http://127.0.0.1:{app.server_port}"
+        print(f"Running {n_sessions} reviewer sessions over {n_pages} '{tool}' pages...")
+        try:
+            with redirect_stdout(sys.stdout if verbose else io.StringIO()):
+                recorder, submits, elapsed = run_sessions(base_url, tool, upload, n_pages,
+                                                          n_sessions, upload_per_session,
+                                                          think_time)
+        finally:
+            app.shutdown()
+            stub.stop()
+    summary = summarise(recorder, submits, elapsed)
+    summary["osm"] = {"requests": stub.request_count, "throttled": stub.throttled_count}
+    summary["config"] = config
+    print_summary(summary)
+    if output_file is not None:
+        with open(output_file, "w") as fid:
+            json.dump(summary, fid, indent=2)
+    regressions = []
+    if baseline_file is not None and save_baseline:
+        with open(baseline_file, "w") as fid:
+            json.dump(summary, fid, indent=2)
+        print(f"Saved baseline to '{baseline_file}'")
+    elif baseline_file is not None:
+        with open(baseline_file) as fid:
+            baseline = json.load(fid)
+        regressions = compare_to_baseline(summary, baseline, tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if not regressions:
+            print(f"No regressions against the baseline '{baseline_file}'")
+    return regressions
+
+def parse_options():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=("This is a command line interface (CLI) for "
+                                                  "the load_test.py module"),
+                                     epilog="Jamie Taylor & Ethan Jones, 2026-10-19")
+    parser.add_argument("-k", "--kind", dest="tool", action="store", type=str,
+                        choices=list(TOOLS), default="groups",
+                        help="Specify the validation tool to load test (default is groups).")
+    parser.add_argument("-n", "--pages", dest="n_pages", action="store", type=int, default=100,
+                        help="Specify the number of pages in the synthetic upload file "
+                             "(default is 100).")
+    parser.add_argument("-w", "--ways-per-page", dest="ways_per_page", action="store", type=int,
+                        default=3, help="Specify the number of ways on each synthetic page "
+                                        "(default is 3).")
+    parser.add_argument("-s", "--sessions", dest="n_sessions", action="store", type=int,
+                        default=4, help="Specify the number of concurrent reviewer sessions "
+                                        "(default is 4).")
+    parser.add_argument("--upload-per-session", dest="upload_per_session", action="store_true",
+                        help="Have every session upload the file concurrently, rather than "
+                             "uploading it once up front.")
+    parser.add_argument("--think-time", dest="think_time", action="store", type=float,
+                        default=0., help="Specify the mean pause in seconds between loading "
+                                         "and submitting each page (default is 0).")
+    parser.add_argument("--latency", dest="latency", action="store", type=float, default=0.,
+                        help="Specify the mean latency in seconds of the stand-in OSM API "
+                             "(default is 0).")
+    parser.add_argument("--throttle-every", dest="throttle_every", action="store", type=int,
+                        default=0, help="Have the stand-in OSM API respond with HTTP 429 to "
+                                        "every nth request.")
+    parser.add_argument("--retry-after", dest="retry_after", action="store", type=float,
+                        default=0., help="Retry-After value sent with throttled responses "
+                                         "(default is 0).")
+    parser.add_argument("-f", "--upload-file", dest="upload_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Upload this file (e.g. a real CSV or a .pack file) instead of "
+                             "the synthetic upload file.")
+    parser.add_argument("-r", "--repd-file", dest="repd_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Specify the path to the REPD Excel file (a synthetic REPD is "
+                             "used by default).")
+    parser.add_argument("-o", "--output-file", dest="output_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Save the results of this run to a JSON file.")
+    parser.add_argument("-b", "--baseline", dest="baseline_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Compare against the baseline JSON file (or save this run as the "
+                             "baseline, with --save-baseline).")
+    parser.add_argument("--save-baseline", dest="save_baseline", action="store_true",
+                        help="Save this run as the baseline instead of comparing against it.")
+    parser.add_argument("--tolerance", dest="tolerance", action="store", type=float, default=0.2,
+                        help="Specify the fractional slow-down allowed before a regression is "
+                             "flagged (default is 0.2).")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="store_true",
+                        help="Show the app's output while the sessions run.")
+    options = parser.parse_args()
+    if options.save_baseline and options.baseline_file is None:
+        raise Exception("--save-baseline requires the baseline file to be given with -b.")
+    if options.upload_file is not None and not os.path.isfile(options.upload_file):
+        raise Exception(f"The upload file '{options.upload_file}' does not exist.")
+    if options.repd_file is not None and not os.path.isfile(options.repd_file):
+        raise Exception(f"The REPD file '{options.repd_file}' does not exist.")
+    return options
+
+if __name__ == "__main__":
+    OPTIONS = parse_options()
+    REGRESSIONS = main(OPTIONS.tool, OPTIONS.n_pages, OPTIONS.ways_per_page, OPTIONS.n_sessions,
+                       OPTIONS.upload_per_session, OPTIONS.think_time, OPTIONS.latency,
+                       OPTIONS.throttle_every, OPTIONS.retry_after, OPTIONS.upload_file,
+                       OPTIONS.repd_file, OPTIONS.output_file, OPTIONS.baseline_file,
+                       OPTIONS.save_baseline, OPTIONS.tolerance, OPTIONS.verbose)
+    sys.exit(1 if REGRESSIONS else 0)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+A shared, pooled client for the OSM API (v0.6).
+
+Connections are kept alive and re-used between calls, concurrency is bounded, throttled (429) and
+server error (5xx) responses are retried with jittered exponential backoff and previously seen
+objects are revalidated using ETag / If-Modified-Since so that unchanged objects cost a 304.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import http.client
+from queue import LifoQueue, Empty
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+OSM_API_URL = os.environ.get("OSM_API_URL", "https://api.openstreetmap.org/api/0.6")
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class OSMAPIError(Exception):
+    """Raised when the OSM API returns an unrecoverable response."""
+    def __init__(self, status, path, message=""):
+        self.status = status
+        self.path = path
+        super().__init__(f"OSM API returned {status} for '{path}' {message}".strip())
+
+class OSMClient:
+    """
+    A thread-safe OSM API client with connection pooling, retries and conditional requests.
+
+    Parameters
+    ----------
+    `base_url` : string
+        Base URL of the OSM API, e.g. "https://api.openstreetmap.org/api/0.6". Point this at a
+        local stand-in server (see `osm_stub_server.py`) for testing.
+    `max_connections` : int
+        Maximum number of concurrent connections (and so in-flight requests) to the API.
+    `max_retries` : int
+        Number of times a throttled / failed request is retried before giving up.
+    `backoff_factor` : float
+        Base delay (in seconds) for the exponential backoff between retries.
+    `max_backoff` : float
+        Upper limit (in seconds) on the delay between retries.
+    `timeout` : float
+        Socket timeout (in seconds) for each request.
+    `user_agent` : string
+        User-Agent header sent with every request.
+    `max_cached` : int
+        Maximum number of responses kept (with their validators) for revalidation by `get()`.
+        The least recently used are evicted first. Set to 0 to disable caching.
+    """
+    def __init__(self, base_url=OSM_API_URL, max_connections=4, max_retries=5, backoff_factor=0.5,
+                 max_backoff=60., timeout=30., user_agent="OSM-PV (Sheffield Solar)",
+                 max_cached=1024):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.netloc
+        self.base_path = url.path.rstrip("/")
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.headers = {"User-Agent": user_agent, "Accept": "application/json",
+                        "Connection": "keep-alive"}
+        self._pool = LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.max_cached = max_cached
+        self._validators = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "requests": 0, "retries": 0, "not_modified": 0,
+                         "errors": 0, "connections": 0, "latency": 0.}
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.counters[key] += value
+
+    def _get_connection(self):
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            self._count(connections=1)
+            if self.scheme == "https":
+                return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+            return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _backoff(self, attempt, retry_after=None):
+        """Sleep for a 'full jitter' exponential backoff, respecting any Retry-After header."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+        if retry_after is not None:
+            try:
+                delay = max(delay, min(self.max_backoff, float(retry_after)))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def _request(self, path, headers):
+        """Make a single request using a pooled connection, returning (status, response, body)."""
+        conn = self._get_connection()
+        try:
+            conn.request("GET", self.base_path + path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._pool.put(conn)
+        return response.status, response, body
+
+    def get(self, path, cache=True):
+        """
+        GET a path (relative to the base URL) and return the decoded JSON body.
+
+        Parameters
+        ----------
+        `path` : string
+            The path to request, e.g. "/way/1234/full.json".
+        `cache` : bool
+            Set to False to neither revalidate from nor add to the response cache, e.g. for bulk
+            fetches of objects that won't be requested again.
+
+        Returns
+        -------
+        dict
+            The decoded JSON response. If the server confirms that a previously seen object is
+            unchanged (HTTP 304), the cached body is returned.
+        """
+        self._count(calls=1)
+        start = time.time()
+        try:
+            with self._slots:
+                cached = self._cached(path) if cache else {}
+                status, response, body = self._get(path, cached.get("etag"),
+                                                   cached.get("last_modified"))
+        finally:
+            self._count(latency=time.time() - start)
+        if status == 304:
+            self._count(not_modified=1)
+            return json.loads(cached["body"])
+        etag = response.getheader("ETag")
+        last_modified = response.getheader("Last-Modified")
+        if cache and (etag or last_modified) and self.max_cached > 0:
+            with self._lock:
+                self._validators[path] = {"etag": etag, "last_modified": last_modified,
+                                          "body": body}
+                self._validators.move_to_end(path)
+                while len(self._validators) > self.max_cached:
+                    self._validators.popitem(last=False)
+        return json.loads(body)
+
+    def _cached(self, path):
+        """Return the cached response for a path (marking it recently used), or an empty dict."""
+        with self._lock:
+            cached = self._validators.get(path)
+            if cached is None:
+                return {}
+            self._validators.move_to_end(path)
+            return cached
+
+    def get_if_modified(self, path, etag=None, last_modified=None):
+        """
+        Conditionally GET a path using validators saved from an earlier response (e.g. in a
+        previous run), without keeping the response body in memory.
+
+        Parameters
+        ----------
+        `path` : string
+            The path to request, e.g. "/way/1234/full.json".
+        `etag` : string
+            The ETag of the previously seen object, if known.
+        `last_modified` : string
+            The Last-Modified date of the previously seen object, if known.
+
+        Returns
+        -------
+        tuple
+            (data, etag, last_modified) where data is the decoded JSON response, or None if the
+            object has not been modified.
+        """
+        self._count(calls=1)
+        start = time.time()
+        try:
+            with self._slots:
+                status, response, body = self._get(path, etag, last_modified)
+        finally:
+            self._count(latency=time.time() - start)
+        if status == 304:
+            self._count(not_modified=1)
+            return None, etag, last_modified
+        return (json.loads(body), response.getheader("ETag"),
+                response.getheader("Last-Modified"))
+
+    def _get(self, path, etag=None, last_modified=None):
+        """Make a (conditional) request, retrying throttled / failed attempts with backoff."""
+        conditional = etag is not None or last_modified is not None
+        headers = dict(self.headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        attempt = 0
+        while True:
+            self._count(requests=1)
+            try:
+                status, response, body = self._request(path, headers)
+            except (http.client.HTTPException, OSError):
+                if attempt >= self.max_retries:
+                    self._count(errors=1)
+                    raise
+                self._count(retries=1)
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            if status == 200 or (status == 304 and conditional):
+                return status, response, body
+            if status in RETRY_STATUSES and attempt < self.max_retries:
+                self._count(retries=1)
+                self._backoff(attempt, response.getheader("Retry-After"))
+                attempt += 1
+                continue
+            self._count(errors=1)
+            raise OSMAPIError(status, path, body[:200].decode("utf-8", "replace"))
+
+    def way_latlons(self, way_id, cache=True):
+        """
+        Return a list of (lat, lon) tuples for the nodes that make up a way. Set `cache` to False
+        for bulk fetches (see `get()`).
+        """
+        return self._way_latlons(self.get(f"/way/{int(way_id)}/full.json", cache)["elements"])
+
+    @staticmethod
+    def _way_latlons(elements):
+        nodes = {e["id"]: (e["lat"], e["lon"]) for e in elements if e["type"] == "node"}
+        way = next(e for e in elements if e["type"] == "way")
+        return [nodes[n] for n in way["nodes"]]
+
+    def way_latlons_if_modified(self, way_id, etag=None, last_modified=None):
+        """
+        Return (latlons, etag, last_modified) for a way, where latlons is None if the way is
+        unchanged since the given validators were issued.
+        """
+        data, etag, last_modified = self.get_if_modified(f"/way/{int(way_id)}/full.json", etag,
+                                                         last_modified)
+        if data is None:
+            return None, etag, last_modified
+        return self._way_latlons(data["elements"]), etag, last_modified
+
+    def node_latlon(self, node_id):
+        """Return the (lat, lon) of a node."""
+        node = self.get(f"/node/{int(node_id)}.json")["elements"][0]
+        return node["lat"], node["lon"]
+
+    def relation_member_ids(self, relation_id):
+        """Return the ids of the members of a relation."""
+        relation = self.get(f"/relation/{int(relation_id)}.json")["elements"][0]
+        return [m["ref"] for m in relation["members"]]
+
+    def map(self, func, items, callback=None):
+        """
+        Apply one of the fetch methods to many ids concurrently (bounded by `max_connections`),
+        returning the results in the same order as `items`. If given, `callback` is called with
+        no arguments as each result is collected (e.g. to update a progress bar).
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            for result in executor.map(func, items):
+                results.append(result)
+                if callback is not None:
+                    callback()
+        return results
+
+    def stats(self):
+        """Return a snapshot of the call / latency counters."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["mean_latency"] = stats["latency"] / stats["calls"] if stats["calls"] else 0.
+        return stats
+
+    def close(self):
+        """Close all pooled connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client():
+    """Return the process-wide shared OSMClient, creating it on first use."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = OSMClient()
+        return _CLIENT
+
+def set_client(client):
+    """Replace the process-wide shared OSMClient (e.g. to point the Flask app at a stub server)."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        previous, _CLIENT = _CLIENT, client
+    if previous is not None:
+        previous.close()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the OSM API (v0.6) for exercising `osm_api.OSMClient` without the network.
+
+Ways, nodes and relations are generated deterministically from their ids, so any id can be
+requested. Latency and throttling (HTTP 429 with Retry-After) are configurable, and ETag /
+If-None-Match revalidation is supported.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_REGEX = re.compile(r"^.*/(way|node|relation)/(\d+)(/full)?\.json$")
+
+def synthetic_node(node_id):
+    """Generate a node somewhere in Great Britain from its id."""
+    rng = random.Random(node_id)
+    return {"type": "node", "id": node_id, "lat": round(rng.uniform(50.5, 55.), 7),
+            "lon": round(rng.uniform(-4., 1.), 7)}
+
+def synthetic_way(way_id, n_nodes=5):
+    """Generate a small closed rectangular way (and its nodes) from its id."""
+    centre = synthetic_node(way_id)
+    rng = random.Random(way_id)
+    dlat, dlon = rng.uniform(1e-4, 2e-3), rng.uniform(1e-4, 2e-3)
+    corners = [(-1, -1), (-1, 1), (1, 1), (1, -1)][:max(n_nodes - 1, 3)]
+    nodes = [{"type": "node", "id": way_id * 10 + i, "lat": round(centre["lat"] + a * dlat, 7),
+              "lon": round(centre["lon"] + b * dlon, 7)} for i, (a, b) in enumerate(corners)]
+    way = {"type": "way", "id": way_id, "nodes": [n["id"] for n in nodes] + [nodes[0]["id"]]}
+    return nodes, way
+
+def synthetic_relation(relation_id, n_members=3):
+    """Generate a relation whose members are ways derived from its id."""
+    members = [{"type": "way", "ref": relation_id * 100 + i, "role": "outer"}
+               for i in range(n_members)]
+    return {"type": "relation", "id": relation_id, "members": members}
+
+class StubOSMHandler(BaseHTTPRequestHandler):
+    """Request handler for the stand-in OSM API."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        if not self.server.quiet:
+            super().log_message(*args)
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Serve a GET request, simulating latency and throttling."""
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            throttled = server.throttle_every and server.request_count % server.throttle_every == 0
+        if server.latency:
+            time.sleep(random.uniform(0, 2 * server.latency))
+        if throttled:
+            with server.lock:
+                server.throttled_count += 1
+            self._send(429, b"Too Many Requests", {"Retry-After": str(server.retry_after)})
+            return
+        match = PATH_REGEX.match(self.path)
+        if match is None:
+            self._send(404, b"Not Found")
+            return
+        obj_type, obj_id, full = match.group(1), int(match.group(2)), match.group(3)
+        if obj_type == "way":
+            nodes, way = synthetic_way(obj_id)
+            elements = nodes + [way] if full else [way]
+        elif obj_type == "node":
+            elements = [synthetic_node(obj_id)]
+        else:
+            elements = [synthetic_relation(obj_id)]
+        etag = f'"{obj_type}-{obj_id}-v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers={"ETag": etag})
+            return
+        body = json.dumps({"version": "0.6", "elements": elements}).encode("utf-8")
+        self._send(200, body, {"Content-Type": "application/json", "ETag": etag})
+
+class StubOSMServer(ThreadingHTTPServer):
+    """
+    A threaded stand-in OSM API server.
+
+    Parameters
+    ----------
+    `address` : tuple
+        (host, port) to bind to. Use port 0 to pick a free port.
+    `latency` : float
+        Mean artificial latency (in seconds) added to each response.
+    `throttle_every` : int
+        Respond with HTTP 429 to every nth request. Set to 0 to disable throttling.
+    `retry_after` : float
+        Value of the Retry-After header sent with throttled responses.
+    `quiet` : bool
+        Set to False to log each request to stderr.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0., throttle_every=0, retry_after=0,
+                 quiet=True):
+        super().__init__(address, StubOSMHandler)
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+
+    @property
+    def url(self):
+        """Base URL to pass to `osm_api.OSMClient`."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/0.6"
+
+    def start(self):
+        """Serve requests from a background thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket."""
+        self.shutdown()
+        self.server_close()
+
+def parse_options():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=("This is a command line interface (CLI) for "
+                                                  "the osm_stub_server.py module"),
+                                     epilog="Jamie Taylor & Ethan Jones, 2026-10-19")
+    parser.add_argument("--host", dest="host", action="store", type=str, default="127.0.0.1",
+                        help="Specify the host to bind to (default is 127.0.0.1).")
+    parser.add_argument("--port", dest="port", action="store", type=int, default=8111,
+                        help="Specify the port to listen on (default is 8111).")
+    parser.add_argument("--latency", dest="latency", action="store", type=float, default=0.,
+                        help="Specify the mean artificial latency in seconds (default is 0).")
+    parser.add_argument("--throttle-every", dest="throttle_every", action="store", type=int,
+                        default=0, help="Respond with HTTP 429 to every nth request.")
+    parser.add_argument("--retry-after", dest="retry_after", action="store", type=float,
+                        default=1, help="Retry-After value sent with throttled responses.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    OPTIONS = parse_options()
+    SERVER = StubOSMServer((OPTIONS.host, OPTIONS.port), OPTIONS.latency, OPTIONS.throttle_every,
+                           OPTIONS.retry_after, quiet=False)
+    print(f"Serving a stand-in OSM API at {SERVER.url} (Ctrl+C to stop)")
+    try:
+        SERVER.serve_forever()
+    except KeyboardInterrupt:
+        SERVER.server_close()
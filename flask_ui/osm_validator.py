@@ -10,13 +10,16 @@ A Flask UI to semi-automate the process of validating OSM PV groupings.
 import os
 import pickle
 import warnings
-from flask import Flask, request, url_for, redirect
+import threading
+from flask import Flask, request, url_for, redirect, abort
 from flask.templating import render_template
-from OSMPythonTools.api import Api
 import pandas as pd
 import numpy as np
 
 from repd import load_repd
+from osm_api import get_client, OSMAPIError
+from validation_pack import PackReader, is_pack
+from grouped_frame import GroupedFrame
 
 ROOT_PATH = os.path.dirname(os.path.realpath(__file__))
 UPLOAD_FOLDER = os.path.join(ROOT_PATH, "uploads")
@@ -48,6 +51,9 @@ FLAG_CODES_REPD_OSM_MATCHES = {
     7: ("System not built yet", "The REPD system in this match is awaiting construction")
 }
 
+# Serialises the read-modify-write of results files between concurrent requests
+RESULTS_LOCK = threading.Lock()
+
 REPD_FILE = "C:/Users/EJones820/Desktop/Sheffield_Solar/osm_pv/pv_datasets/renewable-energy-planning-database-june-2020.xlsx"
 
 @APP.route("/", methods=["GET", "POST"])
@@ -74,51 +80,44 @@ def osm_repd_disagreement_validation_landing_page():
 def validate_osm_repd_disagreement_matches(index):
     """OSM-REPD disagreement matches page."""
     groups_cache_dir = os.path.join(ROOT_PATH, "cache")
-    groups_cache_file = os.path.join(groups_cache_dir, "osmWayFile.p")
+    groups_cache_file = os.path.join(groups_cache_dir, "osmWayFile.npz")
     repd_cache_file = os.path.join(groups_cache_dir, "repd_data.p")
+    pack_file = os.path.join(groups_cache_dir, "disagreements.pack")
     if request.method == "POST" and "osmWayFile" in request.files:
-        osm_repd_matches = pd.read_csv(request.files["osmWayFile"].stream)
-        osm_repd_matches = osm_repd_matches.rename(columns={'Unnamed: 0': 'match_id'})
-        osm_repd_matches_groups = fix_disagreement_groupings(osm_repd_matches)
         if not os.path.isdir(groups_cache_dir):
             os.mkdir(groups_cache_dir)
-        with open(groups_cache_file, "wb") as fid:
-            pickle.dump(osm_repd_matches_groups, fid)
-        print("\n")
-        print("Loading the REPD dataset...")
-        print("\n")
-        repd_df = load_repd(REPD_FILE)
-        print("\n")
-        with open(repd_cache_file, "wb") as fid:
-            pickle.dump(repd_df, fid)
-    else:
-        with open(groups_cache_file, "rb") as fid:
-            osm_repd_matches_groups = pickle.load(fid)
+        if not save_uploaded_pack(request.files["osmWayFile"], pack_file, "disagreements"):
+            osm_repd_matches_groups, same_match = prepare_disagreement_matches(request.files["osmWayFile"].stream)
+            flush_agreed_disagreements(same_match)
+            osm_repd_matches_groups.save(groups_cache_file)
+            print("\n")
+            print("Loading the REPD dataset...")
+            print("\n")
+            repd_df = load_repd(REPD_FILE, compact=True)
+            print("\n")
+            with open(repd_cache_file, "wb") as fid:
+                pickle.dump(repd_df, fid)
+    elif not os.path.isfile(pack_file):
+        osm_repd_matches_groups = GroupedFrame.load(groups_cache_file)
         with open(repd_cache_file, "rb") as fid:
             repd_df = pickle.load(fid)
-    if index >= len(osm_repd_matches_groups):
+    if os.path.isfile(pack_file):
+        n_pages, context = read_pack_page(pack_file, index)
+    else:
+        n_pages, context = len(osm_repd_matches_groups), None
+    if index >= n_pages:
         return redirect(url_for("home_page"))
     if "is_valid" in request.form:
         is_valid = request.form["is_valid"]
         flags = list(map(int, request.form.getlist("flag")))
-        flush_disagreement_matches_results(osm_repd_matches_groups[index].sol_id.values[0], is_valid, flags)
+        sol_id = context["sol_id"] if context else osm_repd_matches_groups[index].sol_id.values[0]
+        flush_disagreement_matches_results(sol_id, is_valid, flags)
         return redirect(url_for("validate_osm_repd_disagreement_matches", index=index+1))
-    matches = osm_repd_matches_groups[index]
-    lats = matches.iloc[0, :].latitude
-    lons = matches.iloc[0, :].longitude
-    soton_repd_ids = matches.soton_repd_id.unique().tolist()
-    turing_repd_ids = matches.turing_repd_id.unique().tolist()
-    turing_repds_table = repd_df.loc[repd_df["id"].isin(turing_repd_ids)].to_html()
-    soton_repds_table = repd_df.loc[repd_df["id"].isin(soton_repd_ids)].to_html()
-    ways = {osm_id: fetch_osm_data(osm_id, "way") for osm_id in matches.osm_id.unique().tolist()}
-    turing_coords = {turing_repd_id: (repd_df[repd_df.id==turing_repd_id].latitude.values[0], repd_df[repd_df.id==turing_repd_id].longitude.values[0]) for turing_repd_id in matches.turing_repd_id.unique().tolist()}
-    soton_coords = {soton_repd_id: (repd_df[repd_df.id == soton_repd_id].latitude.values[0], repd_df[repd_df.id == soton_repd_id].longitude.values[0]) for soton_repd_id in matches.soton_repd_id.unique().tolist()}
-    return render_template("validate_osm_repd_disagreement_matches.html", index=index, ways=ways,
-                           center_lat=lats, center_lon=lons,
+    if context is None:
+        context = disagreement_matches_context(osm_repd_matches_groups[index], repd_df)
+    return render_template("validate_osm_repd_disagreement_matches.html", index=index,
                            bing_key=BING_KEY,
-                           turing_coords=turing_coords, soton_coords=soton_coords,
-                           tables=[turing_repds_table, soton_repds_table],
-                           flag_codes=FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES)
+                           flag_codes=FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES, **context)
 
 @APP.route("/validate_osm_repd_matches/<int:index>", methods=["GET", "POST"])
 def validate_osm_repd_matches(index):
@@ -126,28 +125,31 @@ def validate_osm_repd_matches(index):
     groups_cache_dir = os.path.join(ROOT_PATH, "cache")
     groups_cache_file = os.path.join(groups_cache_dir, "osmWayFile.p")
     repd_cache_file = os.path.join(groups_cache_dir, "repd_data.p")
+    pack_file = os.path.join(groups_cache_dir, "matches.pack")
     if request.method == "POST" and "osmWayFile" in request.files:
-        raw_dataset = pd.read_csv(request.files["osmWayFile"].stream, low_memory=False)
-        filtered_dataset = raw_dataset[raw_dataset[['osm_id', 'repd_id']].notnull().all(1)]
-        expanded_dataset = expand_relations(filtered_dataset)
-        osm_repd_matches_groups = fix_groupings(expanded_dataset)
         if not os.path.isdir(groups_cache_dir):
             os.mkdir(groups_cache_dir)
-        with open(groups_cache_file, "wb") as fid:
-            pickle.dump(osm_repd_matches_groups, fid)
-        print("\n")
-        print("Loading the REPD dataset...")
-        print("\n")
-        repd_df = load_repd(REPD_FILE)
-        print("\n")
-        with open(repd_cache_file, "wb") as fid:
-            pickle.dump(repd_df, fid)
-    else:
+        if not save_uploaded_pack(request.files["osmWayFile"], pack_file, "matches"):
+            osm_repd_matches_groups = prepare_osm_repd_matches(request.files["osmWayFile"].stream)
+            with open(groups_cache_file, "wb") as fid:
+                pickle.dump(osm_repd_matches_groups, fid)
+            print("\n")
+            print("Loading the REPD dataset...")
+            print("\n")
+            repd_df = load_repd(REPD_FILE, compact=True)
+            print("\n")
+            with open(repd_cache_file, "wb") as fid:
+                pickle.dump(repd_df, fid)
+    elif not os.path.isfile(pack_file):
         with open(groups_cache_file, "rb") as fid:
             osm_repd_matches_groups = pickle.load(fid)
         with open(repd_cache_file, "rb") as fid:
             repd_df = pickle.load(fid)
-    if index >= len(osm_repd_matches_groups):
+    if os.path.isfile(pack_file):
+        n_pages, context = read_pack_page(pack_file, index)
+    else:
+        n_pages, context = len(osm_repd_matches_groups), None
+    if index >= n_pages:
         return redirect(url_for("home_page"))
     if "is_valid" in request.form:
         is_valid = request.form["is_valid"]
@@ -155,60 +157,171 @@ def validate_osm_repd_matches(index):
         print("\n")
         print(f"Flushing validation for match index: {index}")
         print("\n")
-        flushes_osm_repd__validation_results(index, osm_repd_matches_groups[index].osm_id_nw.unique().tolist(), osm_repd_matches_groups[index].repd_id.unique().tolist(), is_valid, flags)
+        if context is None:
+            osm_ids = osm_repd_matches_groups[index].osm_id_nw.unique().tolist()
+            repd_ids = osm_repd_matches_groups[index].repd_id.unique().tolist()
+        else:
+            osm_ids, repd_ids = context["osm_ids"], context["repd_ids"]
+        flushes_osm_repd__validation_results(index, osm_ids, repd_ids, is_valid, flags)
         return redirect(url_for("validate_osm_repd_matches", index=index+1))
-    matches = osm_repd_matches_groups[index]
-    lats = matches.iloc[0, :].latitude
-    lons = matches.iloc[0, :].longitude
-    repd_ids = matches.repd_id.unique().tolist()
-    matches_table = matches.to_html()
-    repds_table = repd_df.loc[repd_df["id"].isin(repd_ids)].to_html()
-    osm_data = {osm_id: fetch_osm_data(osm_id, matches[matches["osm_id_nw"] == osm_id].osm_objtype.tolist()[0])
-                for osm_id in matches.osm_id_nw.unique().tolist()}
-    coords = {repd_id: (repd_df[repd_df.id == repd_id].latitude.values[0], repd_df[repd_df.id == repd_id].longitude.values[0])
-              for repd_id in matches.repd_id.unique().tolist()}
-    return render_template("validate_osm_repd_matches.html", index=index, ways=osm_data,
-                           center_lat=lats, center_lon=lons,
+    if context is None:
+        context = osm_repd_matches_context(osm_repd_matches_groups[index], repd_df)
+    return render_template("validate_osm_repd_matches.html", index=index,
                            bing_key=BING_KEY,
-                           coords=coords,
-                           tables=[repds_table, matches_table],
-                           flag_codes=FLAG_CODES_REPD_OSM_MATCHES)
+                           flag_codes=FLAG_CODES_REPD_OSM_MATCHES, **context)
 
 @APP.route("/validate_osm_groups/<int:group_id>", methods=["GET", "POST"])
 def validate_osm_groups(group_id):
     """Group validation page."""
     groups_cache_dir = os.path.join(ROOT_PATH, "cache")
     groups_cache_file = os.path.join(groups_cache_dir, "osmGroupsFile.p")
+    pack_file = os.path.join(groups_cache_dir, "groups.pack")
     if request.method == "POST" and "osmGroupsFile" in request.files:
-        osm_groups = pd.read_csv(request.files["osmGroupsFile"].stream)
         if not os.path.isdir(groups_cache_dir):
             os.mkdir(groups_cache_dir)
-        with open(groups_cache_file, "wb") as fid:
-            pickle.dump(osm_groups, fid)
-    else:
+        if not save_uploaded_pack(request.files["osmGroupsFile"], pack_file, "groups"):
+            osm_groups = pd.read_csv(request.files["osmGroupsFile"].stream)
+            with open(groups_cache_file, "wb") as fid:
+                pickle.dump(osm_groups, fid)
+    elif not os.path.isfile(pack_file):
         with open(groups_cache_file, "rb") as fid:
             osm_groups = pickle.load(fid)
-    if group_id > osm_groups.id.max():
+    if os.path.isfile(pack_file):
+        with PackReader(pack_file) as pack:
+            first_key = pack.meta["first_key"]
+            max_group_id = first_key + len(pack) - 1
+            if group_id < first_key:
+                return redirect(url_for("validate_osm_groups", group_id=first_key))
+            context = pack[group_id - first_key] if group_id <= max_group_id else None
+    else:
+        max_group_id, context = osm_groups.id.max(), None
+    if group_id > max_group_id:
         return redirect(url_for("home_page"))
     if "is_valid" in request.form:
         is_valid = request.form["is_valid"] == "yes"
         flags = list(map(int, request.form.getlist("flag")))
         flush_results(group_id, is_valid, flags)
         return redirect(url_for("validate_osm_groups", group_id=group_id+1))
-    group = osm_groups.loc[osm_groups.id == group_id]
+    if context is None:
+        context = osm_groups_context(osm_groups.loc[osm_groups.id == group_id])
+    return render_template("validate_osm_groups.html", group_id=group_id, bing_key=BING_KEY,
+                           flag_codes=FLAG_CODES_OSM_GROUPINGS, **context)
+
+def save_uploaded_pack(upload, pack_file, kind):
+    """
+    Save an uploaded pack file to the cache, returning False if the upload is not a pack file.
+    Uploading a non-pack file removes any cached pack so the upload is served live instead.
+    The sol_ids a disagreements pack resolved automatically are recorded when it is uploaded.
+    """
+    if not is_pack(upload.stream):
+        if os.path.isfile(pack_file):
+            os.remove(pack_file)
+        return False
+    upload.save(pack_file)
+    with PackReader(pack_file) as pack:
+        pack_kind = pack.kind
+        agreed_sol_ids = pack.section("agreed_sol_ids", []) if pack_kind == kind else []
+    if pack_kind != kind:
+        os.remove(pack_file)
+        abort(400, f"Expected a '{kind}' pack file but got a '{pack_kind}' pack file")
+    if kind == "disagreements":
+        flush_agreed_disagreements(agreed_sol_ids)
+    return True
+
+def read_pack_page(pack_file, index):
+    """
+    Read the page context for an index from a pack file with a single seek-and-read.
+    Returns the number of pages in the pack and the context (None if `index` is out of range).
+    """
+    with PackReader(pack_file) as pack:
+        context = pack[index] if 0 <= index < len(pack) else None
+        return len(pack), context
+
+def osm_groups_context(group):
+    """Build the group validation page context for one OSM group."""
     ways = {}
     mean_lats = []
     mean_lons = []
     for i in group.index:
         lats = group.loc[i, "lats"].split("|")
         lons = group.loc[i, "lons"].split("|")
-        ways[group.loc[i, "objects"]] = zip(lats, lons)
+        ways[group.loc[i, "objects"]] = list(zip(lats, lons))
         mean_lats.append(np.mean(list(map(float, lats))))
         mean_lons.append(np.mean(list(map(float, lons))))
-    mean_lats = np.mean(mean_lats)
-    mean_lons = np.mean(mean_lons)
-    return render_template("validate_osm_groups.html", ways=ways, group_id=group_id,
-                           center_lat=mean_lats, center_lon=mean_lons, bing_key=BING_KEY, flag_codes=FLAG_CODES_OSM_GROUPINGS)
+    return {"ways": ways, "center_lat": np.mean(mean_lats), "center_lon": np.mean(mean_lons)}
+
+def osm_repd_matches_context(matches, repd_df):
+    """Build the OSM-REPD matches validation page context for one group of matches."""
+    lats = matches.iloc[0, :].latitude
+    lons = matches.iloc[0, :].longitude
+    repd_ids = matches.repd_id.unique().tolist()
+    matches_table = matches.to_html()
+    repds_table = repd_df.loc[repd_df["id"].isin(repd_ids)].to_html()
+    osm_data = {osm_id: fetch_osm_data(osm_id, matches[matches["osm_id_nw"] == osm_id].osm_objtype.tolist()[0])
+                for osm_id in matches.osm_id_nw.unique().tolist()}
+    coords = {repd_id: (repd_df[repd_df.id == repd_id].latitude.values[0], repd_df[repd_df.id == repd_id].longitude.values[0])
+              for repd_id in matches.repd_id.unique().tolist()}
+    return {"ways": osm_data, "center_lat": lats, "center_lon": lons, "coords": coords,
+            "tables": [repds_table, matches_table],
+            "osm_ids": matches.osm_id_nw.unique().tolist(), "repd_ids": repd_ids,
+            "checked_flags": suggested_flags(matches)}
+
+def suggested_flags(matches):
+    """
+    Collect the flag codes suggested by geometry_metrics.py for a group of matches, so they can be
+    pre-ticked in the UI. Returns an empty list if the matches file has not been flagged.
+    """
+    if "suggested_flags" not in matches.columns:
+        return []
+    codes = matches.suggested_flags.dropna().astype(str).str.split("|").explode()
+    return sorted({int(float(c)) for c in codes if c})
+
+def disagreement_matches_context(matches, repd_df):
+    """Build the OSM-REPD disagreement matches validation page context for one sol_id."""
+    lats = matches.iloc[0, :].latitude
+    lons = matches.iloc[0, :].longitude
+    soton_repd_ids = matches.soton_repd_id.unique().tolist()
+    turing_repd_ids = matches.turing_repd_id.unique().tolist()
+    turing_repds_table = repd_df.loc[repd_df["id"].isin(turing_repd_ids)].to_html()
+    soton_repds_table = repd_df.loc[repd_df["id"].isin(soton_repd_ids)].to_html()
+    ways = {osm_id: fetch_osm_data(osm_id, "way") for osm_id in matches.osm_id.unique().tolist()}
+    turing_coords = {turing_repd_id: (repd_df[repd_df.id==turing_repd_id].latitude.values[0], repd_df[repd_df.id==turing_repd_id].longitude.values[0]) for turing_repd_id in matches.turing_repd_id.unique().tolist()}
+    soton_coords = {soton_repd_id: (repd_df[repd_df.id == soton_repd_id].latitude.values[0], repd_df[repd_df.id == soton_repd_id].longitude.values[0]) for soton_repd_id in matches.soton_repd_id.unique().tolist()}
+    return {"ways": ways, "center_lat": lats, "center_lon": lons,
+            "turing_coords": turing_coords, "soton_coords": soton_coords,
+            "tables": [turing_repds_table, soton_repds_table],
+            "sol_id": matches.sol_id.values[0]}
+
+def prepare_disagreement_matches(csv_file):
+    """
+    Load an uploaded OSM-REPD disagreement matches file and break it into groups. sol_ids where
+    Turing and Soton agree need no manual review, so only the remaining conflicts are grouped.
+
+    Returns
+    -------
+    tuple
+        (GroupedFrame of the conflicting matches, list of the sol_ids where Turing and Soton
+        agree). Record the latter with `flush_agreed_disagreements`.
+    """
+    osm_repd_matches = pd.read_csv(csv_file)
+    osm_repd_matches = osm_repd_matches.rename(columns={'Unnamed: 0': 'match_id'})
+    same_match, osm_repd_matches = triage_disagreements(osm_repd_matches)
+    print("\n")
+    print(f"Found {len(same_match)} sol_ids where Turing and Soton agree")
+    print("\n")
+    return fix_disagreement_groupings(osm_repd_matches), same_match
+
+def flush_agreed_disagreements(sol_ids):
+    """Record the sol_ids where Turing and Soton agree as "both" correct, flagged "Same match"."""
+    if len(sol_ids):
+        flush_disagreement_matches_results_bulk(sol_ids, "both", [2])
+
+def prepare_osm_repd_matches(csv_file):
+    """Load an uploaded OSM-REPD matches file, expand relations and break it into groups."""
+    raw_dataset = pd.read_csv(csv_file, low_memory=False)
+    filtered_dataset = raw_dataset[raw_dataset[['osm_id', 'repd_id']].notnull().all(1)]
+    expanded_dataset = expand_relations(filtered_dataset)
+    return fix_groupings(expanded_dataset)
 
 def flushes_osm_repd__validation_results(group_id, osm_id, repd_id, validation, flags):
     """Flushes the OSM-REPD validation result to a file."""
@@ -221,17 +334,41 @@ def flushes_osm_repd__validation_results(group_id, osm_id, repd_id, validation,
     flag_labels = [FLAG_CODES_REPD_OSM_MATCHES[k][0] for k in all_flags]
     flag_bools = [f in flags for f in all_flags]
     new_result = pd.DataFrame([[group_id, "|".join(map(str, osm_id)), "|".join(map(str, repd_id)), validation]+flag_bools], columns=["group_id", "osm_id(s)", "repd_id(s)", "validation"] + flag_labels)
-    if os.path.isfile(results_file):
-        results = pd.read_csv(results_file)
-        if group_id in results.group_id:
-            results.drop(results[results.group_id == group_id].index, inplace=True)
-        results = pd.concat((results, new_result), ignore_index=True)
-    else:
-        results = new_result
-    results.to_csv(results_file, index=False)
+    with RESULTS_LOCK:
+        if os.path.isfile(results_file):
+            results = pd.read_csv(results_file)
+            if group_id in results.group_id:
+                results.drop(results[results.group_id == group_id].index, inplace=True)
+            results = pd.concat((results, new_result), ignore_index=True)
+        else:
+            results = new_result
+        results.to_csv(results_file, index=False)
 
 def flush_disagreement_matches_results(sol_id, validation, flags):
     """Flushes the OSM-REPD disagreement validation result to a file."""
+    flush_disagreement_matches_results_bulk([sol_id], validation, flags)
+
+def _migrate_disagreement_results(results):
+    """
+    Relabel the flag columns of a disagreement results file written before it used
+    `FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES`, when codes 1-4 were stored under the
+    `FLAG_CODES_REPD_OSM_MATCHES` labels. Codes 5-7 were never submitted by the disagreement
+    page, so those columns are dropped.
+    """
+    if FLAG_CODES_REPD_OSM_MATCHES[1][0] not in results.columns:
+        return results
+    old_labels = {FLAG_CODES_REPD_OSM_MATCHES[k][0]: k for k in FLAG_CODES_REPD_OSM_MATCHES}
+    columns = {}
+    for column in results.columns:
+        code = old_labels.get(column)
+        if code is None:
+            columns[column] = results[column]
+        elif code in FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES:
+            columns[FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES[code][0]] = results[column]
+    return pd.DataFrame(columns, index=results.index)
+
+def flush_disagreement_matches_results_bulk(sol_ids, validation, flags):
+    """Flushes the same OSM-REPD disagreement validation result for many sol_ids in one write."""
     results_file = os.path.join(ROOT_PATH, "results", "repd_osm_matches_results.csv")
     if validation == "turing":
         validation = 0 #turing mapped to 0
@@ -241,25 +378,40 @@ def flush_disagreement_matches_results(sol_id, validation, flags):
         validation = 2 #both correct mapped to 2
     else:
         validation = 3 #other
-    all_flags = FLAG_CODES_REPD_OSM_MATCHES.keys()
-    flag_labels = [FLAG_CODES_REPD_OSM_MATCHES[k][0] for k in all_flags]
+    all_flags = FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES.keys()
+    flag_labels = [FLAG_CODES_REPD_OSM_DISAGREEMENT_MATCHES[k][0] for k in all_flags]
     flag_bools = [f in flags for f in all_flags]
-    new_result = pd.DataFrame([[sol_id, validation]+flag_bools], columns=["sol_id", "validation"] + flag_labels)
-    if os.path.isfile(results_file):
-        results = pd.read_csv(results_file)
-        if sol_id in results.sol_id:
-            results.drop(results[results.sol_id == sol_id].index, inplace=True)
-        results = pd.concat((results, new_result), ignore_index=True)
-    else:
-        results = new_result
-    results.to_csv(results_file, index=False)
+    new_result = pd.DataFrame([[sol_id, validation]+flag_bools for sol_id in sol_ids], columns=["sol_id", "validation"] + flag_labels)
+    with RESULTS_LOCK:
+        if os.path.isfile(results_file):
+            results = _migrate_disagreement_results(pd.read_csv(results_file))
+            results = results[~results.sol_id.isin(new_result.sol_id)]
+            results = pd.concat((results, new_result), ignore_index=True)
+        else:
+            results = new_result
+        results.to_csv(results_file, index=False)
+
+def triage_disagreements(osm_repd_matches):
+    """
+    Find the sol_ids where Turing and Soton matched the same set of REPD IDs (possibly in a
+    different order), which need no manual review.
+
+    Returns
+    -------
+    tuple
+        (sol_ids with identical sets, the matches for all other sol_ids).
+    """
+    soton = osm_repd_matches[["sol_id", "soton_repd_id"]].dropna().drop_duplicates()
+    turing = osm_repd_matches[["sol_id", "turing_repd_id"]].dropna().drop_duplicates()
+    both = soton.merge(turing, how="outer", left_on=["sol_id", "soton_repd_id"],
+                       right_on=["sol_id", "turing_repd_id"], indicator=True)
+    in_both = (both["_merge"] == "both").groupby(both.sol_id).all()
+    identical = in_both.index[in_both.to_numpy()]
+    return identical.tolist(), osm_repd_matches[~osm_repd_matches.sol_id.isin(identical)]
 
 def fix_disagreement_groupings(repd_matches_df):
     """Breaks dataset into groupings."""
-    groups = []
-    for sol_id in repd_matches_df.sol_id.unique().tolist():
-        group = repd_matches_df.loc[repd_matches_df.sol_id == sol_id, :]
-        groups.append(group)
+    groups = GroupedFrame(repd_matches_df, "sol_id")
     print("\n")
     print(f"Found a total of {len(groups)} groups")
     print("\n")
@@ -273,7 +425,7 @@ def fix_groupings(raw_dataset):
     groups = []
     processed_repd = []
     processed_osm = []
-    for row in raw_dataset.iterrows():
+    for _, row in raw_dataset.iterrows():
         if row.osm_id_nw in processed_osm or row.repd_id in processed_repd:
             continue
         group = raw_dataset.loc[(raw_dataset.repd_id == row.repd_id) | (raw_dataset.osm_id_nw == row.osm_id_nw), :]
@@ -286,42 +438,39 @@ def fix_groupings(raw_dataset):
     return groups
 
 def expand_relations(raw_dataset):
-    """Expands relations into their ways."""
-    non_relation_data = raw_dataset.loc[raw_dataset.osm_objtype != "relation", :]
-    non_relation_data.loc[:, "osm_id_nw"] = non_relation_data.loc[:, "osm_id"]
+    """
+    Expands relations into their ways. The rows for a relation are repeated for each of its
+    member ways, with `osm_id_nw` set to the way id (and `osm_objtype` set to "way").
+    """
+    non_relation_data = raw_dataset.loc[raw_dataset.osm_objtype != "relation", :].copy()
+    non_relation_data["osm_id_nw"] = non_relation_data["osm_id"]
     relation_data = raw_dataset.loc[raw_dataset.osm_objtype == "relation", :]
-    for row in relation_data.iterrows():
+    expanded = [non_relation_data]
+    for _, row in relation_data.iterrows():
         try:
             way_ids = break_relation_into_ways(row.osm_id)
-            temp_df = pd.DataFrame(row).copy(deep=True, ignore_index=True)
-            temp_df["osm_id_nw"] = way_ids
-            non_relation_data = pd.concat([non_relation_data, temp_df], ignore_index=True)
-        except:
+        except OSMAPIError as err:
+            warnings.warn(f"Skipping relation {row.osm_id}: {err}")
             continue
-    return non_relation_data
+        temp_df = pd.DataFrame([row] * len(way_ids)).reset_index(drop=True)
+        temp_df["osm_id_nw"] = way_ids
+        temp_df["osm_objtype"] = "way"
+        expanded.append(temp_df)
+    return pd.concat(expanded, ignore_index=True)
 
 def break_relation_into_ways(osm_id):
     """Takes a relation id and returns the way ids within."""
-    osm_id = int(osm_id)
-    osm = Api()
-    relation = osm.query(f"relation/{osm_id}")
-    way_ids = []
-    for way in relation.members():
-        way_ids.append(way.id())
-    return way_ids
+    return get_client().relation_member_ids(osm_id)
 
 def fetch_osm_data(osm_id, osm_type):
     """
     Fetch ways/nodes from the OSM API.
     """
-    osm_id = int(osm_id)
-    osm = Api()
+    osm = get_client()
     if osm_type == "way":
-        way = osm.query(f"way/{osm_id}")
-        latlons = [(n.lat(), n.lon()) for n in way.nodes()]
+        latlons = osm.way_latlons(osm_id)
     elif osm_type == "node":
-        node = osm.query(f"node/{osm_id}")
-        latlons = [(node.lat(), node.lon())]
+        latlons = [osm.node_latlon(osm_id)]
     return latlons
 
 def flush_results(group_id, is_valid, flags):
@@ -334,14 +483,15 @@ def flush_results(group_id, is_valid, flags):
     flag_labels = [FLAG_CODES_OSM_GROUPINGS[k][0] for k in all_flags]
     flag_bools = [f in flags for f in all_flags]
     new_result = pd.DataFrame([[group_id, is_valid]+flag_bools], columns=["group_id", "is_valid"] + flag_labels)
-    if os.path.isfile(results_file):
-        results = pd.read_csv(results_file)
-        if group_id in results.group_id:
-            results.drop(results[results.group_id == group_id].index, inplace=True)
-        results = pd.concat((results, new_result), ignore_index=True)
-    else:
-        results = new_result
-    results.to_csv(results_file, index=False)
+    with RESULTS_LOCK:
+        if os.path.isfile(results_file):
+            results = pd.read_csv(results_file)
+            if group_id in results.group_id:
+                results.drop(results[results.group_id == group_id].index, inplace=True)
+            results = pd.concat((results, new_result), ignore_index=True)
+        else:
+            results = new_result
+        results.to_csv(results_file, index=False)
 
 def load_bing_key(api_key_file):
     """
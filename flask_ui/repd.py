@@ -6,7 +6,7 @@ import pandas as pd
 
 from geocode import Geocoder
 
-def load_repd(repd_filename, raw=False, cols=None):
+def load_repd(repd_filename, raw=False, cols=None, compact=False):
     """
     Load the REPD dataset into a Pandas DataFrame.
 
@@ -21,6 +21,10 @@ def load_repd(repd_filename, raw=False, cols=None):
     `cols` : list of strings
         Use in conjunction with `raw`=True to filter only certain columns. Useful if re-using
         this method in other code.
+    `compact` : bool
+        Set to True to store the returned columns in smaller dtypes (categoricals, float32
+        coordinates, small nullable integers), reducing the memory footprint. The memory usage
+        before and after is printed. Default is False.
 
     Returns
     -------
@@ -58,4 +62,31 @@ def load_repd(repd_filename, raw=False, cols=None):
           f"'{repd_filename}'")
     repd = repd.assign(source="repd")
     repd = repd.assign(ground_mount=repd.mounting_type.str.contains("Ground"))
+    if compact:
+        repd = compact_repd(repd)
+    return repd
+
+def compact_repd(repd):
+    """
+    Downcast the columns of a REPD DataFrame (as returned by `load_repd`) to compact dtypes.
+
+    Parameters
+    ----------
+    `repd` : Pandas DataFrame
+        The REPD dataframe.
+
+    Returns
+    -------
+    Pandas DataFrame
+        The same data, using categoricals for low-cardinality columns, float32 coordinates,
+        nullable small integers / booleans and datetime install dates.
+    """
+    before = repd.memory_usage(deep=True).sum()
+    repd = repd.astype({"id": "Int32", "dc_capacity": "Float32", "latitude": "float32",
+                        "longitude": "float32", "mounting_type": "category",
+                        "source": "category", "fit_registered": "bool", "operational": "bool",
+                        "ground_mount": "boolean"})
+    repd["install_date"] = pd.to_datetime(repd.install_date, errors="coerce")
+    after = repd.memory_usage(deep=True).sum()
+    print(f"    -> Compacted REPD from {before / 1e6:.2f} MB to {after / 1e6:.2f} MB")
     return repd
\ No newline at end of file
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Precompiled validation "pack" files for the Flask UI.
+
+A pack holds the fully rendered page context (geometry, REPD rows, HTML tables, map centre) for
+every index of a groups / matches file, so the UI can serve any page with a seek-and-read and
+without network access. The layout is:
+
+    magic (8 bytes) | n_records (uint64) | meta_length (uint64) | meta (JSON) |
+    offset table ((n_records + 1) x uint64) | records (JSON) |
+    [sections (JSON) | section directory (JSON) | directory offset (uint64)]
+
+where record `i` occupies the bytes between offsets `i` and `i+1`. Optional named sections hold
+data that is only needed once (e.g. when the pack is uploaded) rather than on every page read.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import os
+import json
+import struct
+import argparse
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"OSMPVPK\x01"
+HEADER = struct.Struct("<8sQQ")
+OFFSET = struct.Struct("<Q")
+PACK_KINDS = ("groups", "matches", "disagreements")
+
+def _to_json(obj):
+    """Convert NumPy / Pandas scalars for `json.dumps`."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, set):
+        return sorted(obj)
+    if pd.isna(obj):
+        return None
+    return str(obj)
+
+def write_pack(filename, kind, n_records, records, sections=None, **meta):
+    """
+    Write a pack file.
+
+    Parameters
+    ----------
+    `filename` : string
+        The filename (including path) of the pack file to write.
+    `kind` : string
+        The type of validation the pack is for, one of `PACK_KINDS`.
+    `n_records` : int
+        The number of records that `records` will yield.
+    `records` : iterable of dicts
+        The page context for each index, in index order. Written as they are yielded, so this
+        can be a generator.
+    `sections` : dict
+        Optionally, named (JSON serialisable) data to store after the records, read with
+        `PackReader.section()`.
+    `**meta`
+        Any other (JSON serialisable) metadata to store in the header.
+    """
+    if kind not in PACK_KINDS:
+        raise ValueError(f"Unknown pack kind '{kind}', expected one of {PACK_KINDS}")
+    meta = json.dumps(dict(meta, kind=kind), default=_to_json).encode("utf-8")
+    table_start = HEADER.size + len(meta)
+    offsets = [table_start + OFFSET.size * (n_records + 1)]
+    with open(filename, "wb") as fid:
+        fid.write(HEADER.pack(MAGIC, n_records, len(meta)))
+        fid.write(meta)
+        fid.write(b"\x00" * OFFSET.size * (n_records + 1))
+        for record in records:
+            data = json.dumps(record, default=_to_json).encode("utf-8")
+            fid.write(data)
+            offsets.append(offsets[-1] + len(data))
+        if len(offsets) != n_records + 1:
+            raise ValueError(f"Expected {n_records} records but got {len(offsets) - 1}")
+        if sections:
+            directory = {}
+            for name, section in sections.items():
+                data = json.dumps(section, default=_to_json).encode("utf-8")
+                directory[name] = [fid.tell(), fid.tell() + len(data)]
+                fid.write(data)
+            directory_start = fid.tell()
+            fid.write(json.dumps(directory).encode("utf-8"))
+            fid.write(OFFSET.pack(directory_start))
+        fid.seek(table_start)
+        fid.write(b"".join(OFFSET.pack(o) for o in offsets))
+
+def is_pack(stream):
+    """Check whether a (seekable) file-like object is a pack file, without consuming it."""
+    position = stream.tell()
+    magic = stream.read(len(MAGIC))
+    stream.seek(position)
+    return magic == MAGIC
+
+class PackReader:
+    """
+    Random access to the records of a pack file. Each lookup reads two offsets and one record,
+    so the cost does not depend on the size of the pack.
+
+    Parameters
+    ----------
+    `filename` : string
+        The filename (including path) of the pack file.
+    """
+    def __init__(self, filename):
+        self.fid = open(filename, "rb")
+        magic, self.n_records, meta_length = HEADER.unpack(self.fid.read(HEADER.size))
+        if magic != MAGIC:
+            self.fid.close()
+            raise ValueError(f"'{filename}' is not a validation pack file")
+        self.meta = json.loads(self.fid.read(meta_length))
+        self.kind = self.meta["kind"]
+        self.table_start = HEADER.size + meta_length
+
+    def __len__(self):
+        return self.n_records
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.n_records:
+            raise IndexError(f"Pack index {index} out of range")
+        self.fid.seek(self.table_start + OFFSET.size * index)
+        start, end = struct.unpack("<QQ", self.fid.read(2 * OFFSET.size))
+        self.fid.seek(start)
+        return json.loads(self.fid.read(end - start))
+
+    def section(self, name, default=None):
+        """Read a named section written after the records, or `default` if there is none."""
+        self.fid.seek(self.table_start + OFFSET.size * self.n_records)
+        records_end, = OFFSET.unpack(self.fid.read(OFFSET.size))
+        file_end = os.fstat(self.fid.fileno()).st_size
+        if file_end <= records_end:
+            return default
+        self.fid.seek(file_end - OFFSET.size)
+        directory_start, = OFFSET.unpack(self.fid.read(OFFSET.size))
+        self.fid.seek(directory_start)
+        directory = json.loads(self.fid.read(file_end - OFFSET.size - directory_start))
+        if name not in directory:
+            return default
+        start, end = directory[name]
+        self.fid.seek(start)
+        return json.loads(self.fid.read(end - start))
+
+    def close(self):
+        """Close the underlying file."""
+        self.fid.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def pack_osm_groups(input_file, output_file):
+    """Pack a grouped OSM ways CSV (the output of fix_groupings.py)."""
+    from osm_validator import osm_groups_context
+    osm_groups = pd.read_csv(input_file)
+    first_key, last_key = int(osm_groups.id.min()), int(osm_groups.id.max())
+    grouped = dict(iter(osm_groups.groupby("id")))
+    empty = {"ways": {}, "center_lat": np.nan, "center_lon": np.nan}
+    records = (osm_groups_context(grouped[k]) if k in grouped else empty
+               for k in range(first_key, last_key + 1))
+    write_pack(output_file, "groups", last_key - first_key + 1, records, first_key=first_key,
+               source=os.path.basename(input_file))
+
+def pack_osm_repd_matches(input_file, output_file, repd_file):
+    """Pack an OSM-REPD matches CSV."""
+    from osm_validator import prepare_osm_repd_matches, osm_repd_matches_context
+    from repd import load_repd
+    groups = prepare_osm_repd_matches(input_file)
+    repd_df = load_repd(repd_file, compact=True)
+    records = (osm_repd_matches_context(g, repd_df) for g in groups)
+    write_pack(output_file, "matches", len(groups), records, source=os.path.basename(input_file))
+
+def pack_disagreement_matches(input_file, output_file, repd_file):
+    """
+    Pack an OSM-REPD disagreement matches CSV. The sol_ids where Turing and Soton agree are
+    stored in the pack's "agreed_sol_ids" section and recorded when the pack is uploaded, not
+    when it is built.
+    """
+    from osm_validator import prepare_disagreement_matches, disagreement_matches_context
+    from repd import load_repd
+    groups, same_match = prepare_disagreement_matches(input_file)
+    repd_df = load_repd(repd_file, compact=True)
+    records = (disagreement_matches_context(g, repd_df) for g in groups)
+    write_pack(output_file, "disagreements", len(groups), records,
+               sections={"agreed_sol_ids": same_match}, source=os.path.basename(input_file))
+
+def main(kind, input_file, output_file, repd_file=None):
+    """
+    Precompute every page of a groups / matches file into a pack file.
+    """
+    if repd_file is None:
+        from osm_validator import REPD_FILE as repd_file
+    if kind == "groups":
+        pack_osm_groups(input_file, output_file)
+    elif kind == "matches":
+        pack_osm_repd_matches(input_file, output_file, repd_file)
+    else:
+        pack_disagreement_matches(input_file, output_file, repd_file)
+    with PackReader(output_file) as pack:
+        print(f"Packed {len(pack)} {kind} pages into '{output_file}'")
+
+def parse_options():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=("This is a command line interface (CLI) for "
+                                                  "the validation_pack.py module"),
+                                     epilog="Jamie Taylor & Ethan Jones, 2026-10-19")
+    parser.add_argument("-k", "--kind", dest="kind", action="store", type=str, required=True,
+                        choices=PACK_KINDS, help="Specify the type of file being packed.")
+    parser.add_argument("-f", "--input-file", dest="input_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the input CSV file.")
+    parser.add_argument("-o", "--output-file", dest="output_file", action="store", type=str,
+                        required=True, metavar="</path/to/file>",
+                        help="Specify the path to the output pack file.")
+    parser.add_argument("-r", "--repd-file", dest="repd_file", action="store", type=str,
+                        default=None, metavar="</path/to/file>",
+                        help="Specify the path to the REPD file (defaults to the UI's REPD_FILE).")
+    options = parser.parse_args()
+    if not os.path.isfile(options.input_file):
+        raise Exception(f"The input file '{options.input_file}' does not exist.")
+    return options
+
+if __name__ == "__main__":
+    OPTIONS = parse_options()
+    main(OPTIONS.kind, OPTIONS.input_file, OPTIONS.output_file, OPTIONS.repd_file)
@@ -0,0 +1,182 @@
+"""
+Incrementally re-group OSM neighbour pairings against the state saved by a previous run.
+
+Only the components touched by added or removed pairings are recomputed, group IDs are kept for
+groups whose membership hasn't changed, and only ways that are new (or, optionally, changed on
+OSM) are fetched. Groups are the connected components of the pairings.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import os
+import pickle
+import hashlib
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from flask_ui.osm_api import get_client
+
+STATE_VERSION = 1
+
+def empty_state():
+    """Return the state of a run with no pairings."""
+    ways = pd.DataFrame(columns=["lats", "lons", "hash", "etag", "last_modified"],
+                        index=pd.Index([], name="objects"))
+    return {"version": STATE_VERSION, "edges": set(), "components": {}, "next_id": 1,
+            "ways": ways}
+
+def load_state(filename):
+    """Load the state saved by a previous run, or an empty state if there isn't one."""
+    if not os.path.isfile(filename):
+        return empty_state()
+    with open(filename, "rb") as fid:
+        state = pickle.load(fid)
+    if state.get("version") != STATE_VERSION:
+        raise Exception(f"The state file '{filename}' is from an incompatible version")
+    return state
+
+def save_state(filename, state):
+    """Save the state of this run for the next incremental run."""
+    with open(filename, "wb") as fid:
+        pickle.dump(state, fid)
+
+def pairings_to_edges(pairings):
+    """Convert a DataFrame of object / neighbour_object pairings to a set of undirected edges."""
+    pairings = pairings.dropna(subset=["object", "neighbour_object"])
+    a = pairings.object.astype(str).to_numpy()
+    b = pairings.neighbour_object.astype(str).to_numpy()
+    keep = a != b
+    a, b = a[keep], b[keep]
+    first, second = np.where(a < b, a, b), np.where(a < b, b, a)
+    return set(zip(first.tolist(), second.tolist()))
+
+def connected_components(edges):
+    """Return the connected components (as a list of sets) of a graph given as a set of edges."""
+    parent = {}
+    def find(node):
+        root = node
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+    for a, b in edges:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+    components = defaultdict(set)
+    for node in parent:
+        components[find(node)].add(node)
+    return list(components.values())
+
+def update_components(state, edges):
+    """
+    Update the component (group) assignments in `state` for a new set of edges.
+
+    Only components containing an endpoint of an added or removed edge are recomputed. A
+    recomputed component keeps the ID of the old group it shares most members with (so a group
+    whose membership hasn't changed always keeps its ID), otherwise it is given a new ID.
+
+    Returns
+    -------
+    tuple
+        (components, next_id, summary) where components maps each object to its group ID.
+    """
+    old_components = state["components"]
+    added, removed = edges - state["edges"], state["edges"] - edges
+    changed_nodes = {node for edge in added | removed for node in edge}
+    affected_ids = {old_components[n] for n in changed_nodes if n in old_components}
+    affected_nodes = changed_nodes | {n for n, i in old_components.items() if i in affected_ids}
+    sub_edges = {e for e in edges if e[0] in affected_nodes}
+    new_groups = sorted(connected_components(sub_edges), key=lambda g: (-len(g), min(g)))
+    components = {n: i for n, i in old_components.items() if i not in affected_ids}
+    next_id = state["next_id"]
+    claimed = set()
+    for group in new_groups:
+        overlaps = Counter(old_components[n] for n in group if n in old_components)
+        candidates = [i for i, _ in sorted(overlaps.items(), key=lambda x: (-x[1], x[0]))
+                      if i not in claimed]
+        if candidates:
+            group_id = candidates[0]
+        else:
+            group_id = next_id
+            next_id += 1
+        claimed.add(group_id)
+        components.update({n: group_id for n in group})
+    summary = {"added": len(added), "removed": len(removed), "regrouped": len(new_groups),
+               "groups": len(set(components.values()))}
+    return components, next_id, summary
+
+def geometry_hash(lats, lons):
+    """A short content hash of a way's geometry."""
+    return hashlib.sha1(f"{lats}/{lons}".encode("utf-8")).hexdigest()[:16]
+
+def refresh_geometry(ways, objects, revalidate=False, progress=None):
+    """
+    Fetch the geometry of the ways in `objects` that aren't in `ways` (the geometry saved by the
+    previous run). If `revalidate` is True, ways already in `ways` are also conditionally
+    re-requested using their saved ETag / Last-Modified, which costs a 304 if they are unchanged.
+
+    Returns
+    -------
+    tuple
+        (ways, summary) where ways holds the geometry of every way in `objects`.
+    """
+    ways = ways.reindex(pd.Index(sorted(objects), name="objects"))
+    known = ways.hash.notnull()
+    to_fetch = ways.index[~known] if not revalidate else ways.index
+    osm = get_client()
+    def fetch(obj):
+        etag, last_modified = ways.at[obj, "etag"], ways.at[obj, "last_modified"]
+        etag = etag if isinstance(etag, str) else None
+        last_modified = last_modified if isinstance(last_modified, str) else None
+        return osm.way_latlons_if_modified(obj.split("/")[-1], etag, last_modified)
+    results = osm.map(fetch, to_fetch, callback=progress)
+    fetched = pd.DataFrame([(obj, "|".join(map(str, [l[0] for l in latlons])),
+                             "|".join(map(str, [l[1] for l in latlons])), etag, last_modified)
+                            for obj, (latlons, etag, last_modified) in zip(to_fetch, results)
+                            if latlons is not None],
+                           columns=["objects", "lats", "lons", "etag", "last_modified"])
+    fetched = fetched.set_index("objects")
+    fetched["hash"] = [geometry_hash(la, lo) for la, lo in zip(fetched.lats, fetched.lons)]
+    previous = ways.loc[fetched.index, "hash"]
+    changed = int((previous.notnull() & (previous != fetched.hash)).sum())
+    columns = ["lats", "lons", "hash", "etag", "last_modified"]
+    ways.loc[fetched.index, columns] = fetched[columns].to_numpy()
+    summary = {"new": int((~known).sum()), "changed": changed,
+               "requested": len(to_fetch)}
+    return ways, summary
+
+def regroup(pairings_file, output_file, state_file, telemetry, revalidate=False):
+    """
+    Incrementally group the pairings in `pairings_file` against the state in `state_file`
+    (which is created if it doesn't exist, and updated), writing the grouped ways to
+    `output_file` in the same format as fix_groupings.py. Progress is reported to `telemetry`
+    (a `telemetry.Telemetry`).
+    """
+    with telemetry.stage("read", total=1) as stage:
+        state = load_state(state_file)
+        edges = pairings_to_edges(pd.read_csv(pairings_file))
+        stage.update()
+    with telemetry.stage("group", total=len(edges)) as stage:
+        components, next_id, summary = update_components(state, edges)
+        stage.update(len(edges))
+    print(f"    -> {summary['added']} pairings added, {summary['removed']} removed, "
+          f"{summary['regrouped']} of {summary['groups']} groups recomputed")
+    with telemetry.stage("fetch") as stage:
+        ways, summary = refresh_geometry(state["ways"], components.keys(), revalidate,
+                                         progress=stage.update)
+    print(f"    -> {summary['new']} new ways and {summary['changed']} changed ways fetched")
+    with telemetry.stage("write", total=len(components)) as stage:
+        groups = pd.DataFrame({"id": list(components.values())},
+                              index=pd.Index(list(components.keys()), name="objects"))
+        groups = groups.join(ways[["lats", "lons"]]).reset_index()
+        groups = groups.sort_values(["id", "objects"])[["id", "objects", "lats", "lons"]]
+        groups.to_csv(output_file, index=False)
+        save_state(state_file, {"version": STATE_VERSION, "edges": edges,
+                                "components": components, "next_id": next_id, "ways": ways})
+        stage.update(len(components))
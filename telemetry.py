@@ -0,0 +1,222 @@
+"""
+Progress and throughput telemetry for long-running CLI jobs.
+
+Each job is broken into named stages (e.g. read, group, fetch, compare, write). Stages report
+progress with items/sec and ETA, and the wall time, peak RSS and OSM API call counts of every
+stage are summarised at the end. Events can optionally be written as JSON lines for job
+monitoring.
+
+- Jamie Taylor <jamie.taylor@sheffield.ac.uk>
+- Ethan Jones <ejones18@sheffield.ac.uk>
+- First Authored: 2026-10-19
+"""
+
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+def print_progress(iteration, total, prefix="", suffix="", decimals=2, bar_length=100):
+    """
+    Call in a loop to create terminal progress bar.
+    Parameters
+    ----------
+    `iteration` : int
+        current iteration (required)
+    `total` : int
+        total iterations (required)
+    `prefix` : string
+        prefix string (optional)
+    `suffix` : string
+        suffix string (optional)
+    `decimals` : int
+        number of decimals in percent complete (optional)
+    `bar_length` : int
+        character length of bar (optional)
+    Notes
+    -----
+    Taken from `Stack Overflow <http://stackoverflow.com/a/34325723>`_.
+    """
+    filled_length = int(round(bar_length * iteration / float(total)))
+    percents = round(100.00 * (iteration / float(total)), decimals)
+    progress_bar = "#" * filled_length + "-" * (bar_length - filled_length)
+    sys.stdout.write("\r%s |%s| %s%s %s" % (prefix, progress_bar, percents, "%", suffix))
+    sys.stdout.flush()
+    if iteration == total:
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3 # bytes on macOS, else KB
+
+class Stage:
+    """Progress of a single stage of a job. Call `update()` as items are processed."""
+    def __init__(self, telemetry, name, total=None):
+        self.telemetry = telemetry
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.reported = 0
+        self.start = time.time()
+        self._last_report = 0.
+
+    def update(self, n=1):
+        """Record that `n` more items have been processed."""
+        self.done += n
+        now = time.time()
+        if self.done == self.total or now - self._last_report >= self.telemetry.interval:
+            self._last_report = now
+            self.reported = self.done
+            self.telemetry.report(self)
+
+    def progress(self):
+        """Return a dict of the current progress of this stage."""
+        elapsed = time.time() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.
+        eta = (self.total - self.done) / rate if self.total and rate > 0 else None
+        return {"stage": self.name, "done": self.done, "total": self.total,
+                "elapsed": round(elapsed, 3), "rate": round(rate, 3),
+                "eta": None if eta is None else round(eta, 3)}
+
+class Telemetry:
+    """
+    Collect progress and telemetry for the stages of a job.
+
+    Parameters
+    ----------
+    `job` : string
+        Name of the job, included in every event.
+    `jsonl_file` : string
+        Optionally, the path to a file to append JSON-lines events to.
+    `api_stats` : callable
+        Optionally, a function returning a dict of API counters (e.g. `OSMClient.stats`). The
+        change in "calls" over each stage is reported.
+    `quiet` : bool
+        Set to True to suppress terminal output. Default is False.
+    `interval` : float
+        Minimum number of seconds between progress reports. Default is 0.5.
+    """
+    def __init__(self, job, jsonl_file=None, api_stats=None, quiet=False, interval=0.5):
+        self.job = job
+        self.api_stats = api_stats
+        self.quiet = quiet
+        self.interval = interval
+        self.start = time.time()
+        self.stages = []
+        self.finished = False
+        self.jsonl = open(jsonl_file, "a") if jsonl_file else None
+
+    def _api_calls(self):
+        return self.api_stats()["calls"] if self.api_stats else None
+
+    def emit(self, event, **fields):
+        """Write an event to the JSON-lines file (if any)."""
+        if self.jsonl is None:
+            return
+        record = {"time": round(time.time(), 3), "job": self.job, "event": event}
+        record.update(fields)
+        self.jsonl.write(json.dumps(record) + "\n")
+        self.jsonl.flush()
+
+    def report(self, stage):
+        """Report the progress of a stage to the terminal and JSON-lines file."""
+        progress = stage.progress()
+        self.emit("progress", **progress)
+        if self.quiet:
+            return
+        suffix = f"{progress['done']} items, {progress['rate']:.1f} items/s"
+        if progress["eta"] is not None:
+            suffix += f", ETA {time.strftime('%H:%M:%S', time.gmtime(progress['eta']))}"
+        if stage.total:
+            print_progress(min(stage.done, stage.total), stage.total, prefix=f"{stage.name:>8}",
+                           suffix=suffix, bar_length=40)
+        else:
+            sys.stdout.write(f"\r{stage.name:>8} {suffix}")
+            sys.stdout.flush()
+
+    @contextmanager
+    def stage(self, name, total=None):
+        """
+        Time a stage of the job.
+
+        Parameters
+        ----------
+        `name` : string
+            Name of the stage.
+        `total` : int
+            Number of items the stage will process, if known (enables the progress bar and ETA).
+
+        Yields
+        ------
+        Stage
+            Call its `update()` method as items are processed.
+        """
+        calls_before = self._api_calls()
+        stage = Stage(self, name, total)
+        self.emit("stage_start", stage=name, total=total)
+        error = None
+        try:
+            yield stage
+        except BaseException as err:
+            error = f"{type(err).__name__}: {err}"
+            raise
+        finally:
+            if stage.done != stage.reported:
+                stage.reported = stage.done
+                self.report(stage)
+            summary = stage.progress()
+            summary["peak_rss_mb"] = peak_rss_mb()
+            if calls_before is not None:
+                summary["api_calls"] = self._api_calls() - calls_before
+            if error is not None:
+                summary["error"] = error
+            self.stages.append(summary)
+            self.emit("stage_end", **summary)
+            if not self.quiet:
+                if stage.done and (stage.total is None or stage.done < stage.total):
+                    sys.stdout.write("\n")
+                status = "failed" if error is not None else "finished"
+                print(f"{name:>8} {status} in {summary['elapsed']:.2f} s ({stage.done} items)")
+            if error is not None:
+                self.finish(error=f"{name}: {error}")
+
+    def finish(self, error=None):
+        """
+        Print a summary of every stage and close the JSON-lines file. `error` describes why the
+        job failed, if it did. A stage that raises calls this itself, and later calls do nothing.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        elapsed = round(time.time() - self.start, 3)
+        job_end = {"elapsed": elapsed, "peak_rss_mb": peak_rss_mb(), "stages": self.stages}
+        if error is not None:
+            job_end["error"] = error
+        self.emit("job_end", **job_end)
+        if not self.quiet:
+            if error is not None:
+                print(f"--- {self.job}: failed after {elapsed:.2f} seconds ({error}) ---")
+            else:
+                print(f"--- {self.job}: total execution time {elapsed:.2f} seconds ---")
+            for stage in self.stages:
+                line = f"    {stage['stage']:>8}: {stage['elapsed']:>10.2f} s"
+                line += f", {stage['done']} items, {stage['rate']:.1f} items/s"
+                if stage["peak_rss_mb"] is not None:
+                    line += f", peak RSS {stage['peak_rss_mb']:.1f} MB"
+                if "api_calls" in stage:
+                    line += f", {stage['api_calls']} API calls"
+                if "error" in stage:
+                    line += f", failed with {stage['error']}"
+                print(line)
+        if self.jsonl is not None:
+            self.jsonl.close()
+            self.jsonl = None